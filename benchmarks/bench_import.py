@@ -0,0 +1,45 @@
+"""Time a cold ``import notion_to_markdown`` in fresh interpreters
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_import.py``. Heavy dependencies are
+imported on first use, the listed ones should not be loaded by the import.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["asyncio", "httpx", "notion_client", "pytablewriter", "sqlite3"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import notion_to_markdown
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in %r if name in sys.modules]]))
+""" % (HEAVY_MODULES,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    times = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT], check=True, capture_output=True, text=True
+        ).stdout
+        elapsed, loaded = json.loads(output)
+        times.append(elapsed)
+
+    print(
+        f"import notion_to_markdown: median {statistics.median(times) * 1000:.1f} ms, "
+        f"min {min(times) * 1000:.1f} ms over {args.runs} runs"
+    )
+    print(f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Time rich text rendering, the innermost loop of every conversion
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_rich_text.py``.
+"""
+import argparse
+import random
+import time
+from unittest.mock import MagicMock
+
+from notion_to_markdown import NotionToMarkdown
+
+ANNOTATIONS = ["bold", "italic", "strikethrough", "underline", "code"]
+
+
+def span(text: str, annotated: bool) -> dict:
+    annotations = {key: False for key in ANNOTATIONS}
+    annotations["color"] = "default"
+    if annotated:
+        annotations[random.choice(ANNOTATIONS)] = True
+    return {
+        "type": "text",
+        "plain_text": text,
+        "annotations": annotations,
+        "href": None,
+    }
+
+
+def paragraphs(count: int, spans: int, annotated: float):
+    return [
+        {
+            "type": "paragraph",
+            "paragraph": {
+                "rich_text": [
+                    span(f" word{index} ", random.random() < annotated)
+                    for index in range(spans)
+                ]
+            },
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=10_000)
+    parser.add_argument("--spans", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+
+    for annotated in [0.0, 0.2, 1.0]:
+        blocks = paragraphs(args.blocks, args.spans, annotated)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for block in blocks:
+                n2m.block_to_markdown(block)
+            best = min(best, time.perf_counter() - start)
+        spans = args.blocks * args.spans
+        print(
+            f"{annotated:>4.0%} annotated {spans:>8} spans {best * 1000:>8.1f} ms "
+            f"{best / spans * 1e9:>6.0f} ns/span"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Time md.table on large tables, against pytablewriter when installed
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_table.py``.
+"""
+import argparse
+import time
+
+from notion_to_markdown.utils import md
+
+
+def table_cells(rows: int, columns: int):
+    header = [f"Column {column}" for column in range(columns)]
+    return [header] + [
+        [f"row {row} cell {column} **text**" for column in range(columns)]
+        for row in range(rows)
+    ]
+
+
+def best_time(render, cells, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(cells)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import pytablewriter  # noqa: F401
+    except ImportError:
+        pytablewriter = None
+
+    for rows in [500, 1000, 2000, 4000]:
+        cells = table_cells(rows, args.columns)
+        native = best_time(md.table, cells, args.repeat)
+        line = f"{rows:>5} rows  native {native * 1000:>8.1f} ms"
+        if pytablewriter is not None:
+            fallback = best_time(
+                lambda cells: md.table(cells, use_pytablewriter=True),
+                cells,
+                args.repeat,
+            )
+            line += f"  pytablewriter {fallback * 1000:>8.1f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Time to_markdown_string on synthetic pages of growing size
+
+Run from the repository root with
+``PYTHONPATH=. python benchmarks/bench_to_markdown_string.py``. Rendering is
+linear when the time per block stays flat as pages grow.
+"""
+import argparse
+import time
+from unittest.mock import MagicMock
+
+from notion_to_markdown import NotionToMarkdown
+
+
+def flat_page(size: int):
+    return [
+        {"type": "paragraph", "parent": f"Paragraph {index} " + "text " * 20}
+        for index in range(size)
+    ]
+
+
+def nested_page(size: int, depth: int = 20):
+    """Runs of nested list items and toggles, depth levels deep"""
+    blocks = []
+    for _ in range(size // (depth + 1)):
+        children = []
+        for level in reversed(range(depth)):
+            block_type = "toggle" if level % 5 == 0 else "bulleted_list_item"
+            children = [{"type": block_type, "parent": f"- item {level}", "children": children}]
+        blocks.extend(children)
+        blocks.append({"type": "paragraph", "parent": "Paragraph " + "text " * 20})
+    return blocks
+
+
+def count_blocks(blocks) -> int:
+    return sum(1 + count_blocks(block.get("children") or []) for block in blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-blocks", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+    sizes = [args.max_blocks // 8, args.max_blocks // 4, args.max_blocks // 2, args.max_blocks]
+
+    for name, make_page in [("flat", flat_page), ("nested", nested_page)]:
+        for size in sizes:
+            page = make_page(size)
+            blocks = count_blocks(page)
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                n2m.to_markdown_string(page)
+                best = min(best, time.perf_counter() - start)
+            print(
+                f"{name:>6} {blocks:>8} blocks {best * 1000:>9.1f} ms "
+                f"{best / blocks * 1e6:>6.2f} us/block"
+            )
+
+
+if __name__ == "__main__":
+    main()
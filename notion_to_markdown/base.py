@@ -1,8 +1,85 @@
-import re
-from typing import Dict, List, Optional, Union
-from notion_client import Client, AsyncClient
+from __future__ import annotations
+
+import os
+import posixpath
+import threading
+from collections import deque
+from itertools import chain, count
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from .utils import md
-from .utils.notion import get_block_children, get_block_children_async
+from .utils.assets import AssetFile
+from .utils.cache import SyncedBlockCache
+from .utils.notion import (
+    AsyncLazyChildren,
+    LazyChildren,
+    aiter_block_children,
+    aiter_database_pages,
+    block_expiry_time,
+    earliest_expiry_time,
+    expires_within,
+    iter_block_children,
+    get_block_children,
+    get_block_children_async,
+)
+from .utils.lazy import LazyModule
+
+if TYPE_CHECKING:
+    import asyncio
+    import httpx
+    from concurrent import futures
+    from concurrent.futures import Executor
+    from notion_client import Client, AsyncClient
+else:
+    asyncio = LazyModule("asyncio")
+    httpx = LazyModule("httpx")
+    futures = LazyModule("concurrent.futures")
+
+# Annotations rendered as markup, spans without any are left as they are.
+MARKUP_ANNOTATIONS = ("code", "bold", "italic", "strikethrough", "underline")
+
+# Marks where images converted to base64 are streamed into the output.
+DEFERRED_IMAGE_MARK = "\x00"
+
+
+class ImageTooLarge(Exception):
+    """Raised before downloading an image over max_inline_image_size"""
+
+
+def _join_chunks(chunks: List) -> str:
+    """Join nested lists of strings depth first, without recursion"""
+    strings = []
+    stack = [iter(chunks)]
+    while stack:
+        for chunk in stack[-1]:
+            if isinstance(chunk, list):
+                stack.append(iter(chunk))
+                break
+            strings.append(chunk)
+        else:
+            stack.pop()
+    return "".join(strings)
+
+
+def _same_markup(annotations: Optional[Dict], other: Optional[Dict]) -> bool:
+    """Check whether two spans are rendered with the same markup"""
+    if annotations == other:
+        return True
+    annotations = annotations or {}
+    other = other or {}
+    return all(
+        bool(annotations.get(name)) == bool(other.get(name))
+        for name in MARKUP_ANNOTATIONS
+    )
 
 
 class NotionToMarkdownBase:
@@ -18,15 +95,287 @@ class NotionToMarkdownBase:
             "separate_child_page": False,
             "convert_images_to_base64": False,
             "parse_child_pages": True,
+            "max_concurrency": 1,
+            "executor": None,
+            "rate_limiter": None,
+            "block_cache": None,
+            "synced_block_cache": None,
+            "http_client": None,
+            "image_cache": None,
+            "max_inline_image_size": None,
+            "assets_dir": None,
+            "use_pytablewriter": False,
         }
         self.config = {**default_config, **(config or {})}
         self.custom_transformers = {}
+        self.manifest = {}
+        self._previous_manifest = {}
+        self._expiry_times = {}
+        self.synced_block_cache = (
+            self.config["synced_block_cache"] or SyncedBlockCache()
+        )
+        self._http_client = self.config["http_client"]
+        self._deferred_images = None
+        self._deferred_image_ids = None
+        self._assets = {}
 
     def set_custom_transformer(self, block_type: str, transformer_func):
         """Set a custom transformer for a specific block type"""
         self.custom_transformers[block_type] = transformer_func
         return self
 
+    def _spawn(self) -> "NotionToMarkdownBase":
+        """Create a converter sharing the config, transformers and caches
+
+        Conversions keep their manifest and streamed images on a spawned
+        converter, so ones running on this converter at the same time do
+        not see each other's.
+        """
+        n2m = type(self)(
+            self.notion_client,
+            {
+                **self.config,
+                "synced_block_cache": self.synced_block_cache,
+                "http_client": self.http_client,
+            },
+        )
+        n2m.custom_transformers = self.custom_transformers
+        n2m._assets = self._assets
+        return n2m
+
+    def _spawn_conversion(self) -> "NotionToMarkdownBase":
+        """Spawn a converter for one conversion
+
+        Without a synced_block_cache in the config, synced block originals
+        are shared within the conversion only, so edits to them show in the
+        next one.
+        """
+        n2m = self._spawn()
+        if self.config["synced_block_cache"] is None:
+            n2m.synced_block_cache = SyncedBlockCache()
+        return n2m
+
+    def _media_link(self, block_content: Dict) -> str:
+        """Get the URL of an image, video, file or pdf block"""
+        if block_content["type"] == "external":
+            return block_content["external"]["url"]
+        return block_content["file"]["url"]
+
+    @staticmethod
+    def _file_block_id(block: Dict) -> Optional[str]:
+        """Get the id keying the signed URL of a file hosted by Notion
+
+        External files are None, their URL is stable and keys them by itself.
+        """
+        if block[block["type"]]["type"] != "file":
+            return None
+        return block.get("id")
+
+    @staticmethod
+    def _too_large(size: Optional[Union[int, str]], max_size: Optional[int]) -> bool:
+        """Check whether a download size is over an optional limit"""
+        return max_size is not None and size is not None and int(size) > max_size
+
+    def _asset_path(self, name: str) -> str:
+        """Get the path markdown links to a file in assets_dir by"""
+        return posixpath.join(self.config["assets_dir"].replace(os.sep, "/"), name)
+
+    def _media_links(self, blocks: List[Dict]) -> Dict[str, Optional[str]]:
+        """Get the downloadable URLs of media blocks, mapped to their block ids"""
+        media_types = ["image", "video", "file", "pdf"]
+        if not self.config["assets_dir"]:
+            media_types = ["image"]
+        links = {
+            self._media_link(block[block["type"]]): self._file_block_id(block)
+            for block in blocks
+            if block.get("type") in media_types
+            and block["type"] not in self.custom_transformers
+            and block.get(block["type"])
+        }
+        return {
+            link: block_id
+            for link, block_id in links.items()
+            if not link.startswith("data:")
+        }
+
+    def _defer_image(
+        self, title: str, link: str, block_id: Optional[str]
+    ) -> Optional[str]:
+        """Leave a mark to stream the image data at, when streaming"""
+        if self._deferred_images is None:
+            return None
+        image_id = next(self._deferred_image_ids)
+        self._deferred_images[image_id] = (title, link, block_id)
+        return f"{DEFERRED_IMAGE_MARK}{image_id}{DEFERRED_IMAGE_MARK}"
+
+    def _split_deferred_images(
+        self, chunk: str
+    ) -> Iterator[Union[str, Tuple[str, str, Optional[str]]]]:
+        """Split a chunk into text and the deferred images marked in it"""
+        for index, part in enumerate(chunk.split(DEFERRED_IMAGE_MARK)):
+            if index % 2:
+                yield self._deferred_images.pop(int(part))
+            elif part:
+                yield part
+
+    def _skip_block(self, block: Dict) -> bool:
+        """Check whether a block is left out of the markdown blocks"""
+        return block["type"] == "unsupported" or (
+            block["type"] == "child_page" and not self.config["parse_child_pages"]
+        )
+
+    def _children_block_id(self, block: Dict) -> str:
+        """Get the id to list children from, resolving synced block copies"""
+        if block["type"] == "synced_block" and block["synced_block"].get(
+            "synced_from"
+        ):
+            return block["synced_block"]["synced_from"]["block_id"]
+        return block["id"]
+
+    def _synced_source_id(self, block: Dict) -> Optional[str]:
+        """Get the id of the original of a synced block copy"""
+        if block["type"] in self.custom_transformers:
+            return None
+        if block["id"] == self._children_block_id(block):
+            return None
+        return self._children_block_id(block)
+
+    def _children_version(self, block: Dict) -> Optional[str]:
+        """Get the version the children of a block are cached against"""
+        if block["id"] != self._children_block_id(block):
+            return None
+        return block.get("last_edited_time")
+
+    def _start_manifest(self, manifest: Optional[Dict], record: bool = True) -> None:
+        """Start a manifest, reusing blocks unchanged since the given one
+
+        Without ``record``, ``self.manifest`` is None and converted blocks
+        are not kept for the next run.
+        """
+        self._previous_manifest = manifest or {}
+        self.manifest = {} if record else None
+
+    def _reuse_md_block(self, block: Dict) -> Optional[Dict]:
+        """Get the markdown block of the previous run if the block is unchanged
+
+        The subtree is rebuilt from the entries its children are referred to
+        by, which are carried over to the new manifest.
+        """
+        version = self._children_version(block)
+        entry = self._previous_manifest.get(block["id"])
+        if version is None or not entry or entry["last_edited_time"] != version:
+            return None
+        # Signed file URLs rendered in the subtree expire, render it again.
+        if expires_within(entry.get("expiry_time")):
+            return None
+
+        reused = {block["id"]: entry}
+        md_block = {**entry["md_block"], "children": []}
+        stack = [(entry["md_block"]["children"], md_block["children"])]
+        while stack:
+            refs, md_children = stack.pop()
+            for ref in refs:
+                if isinstance(ref, str):
+                    child_entry = self._previous_manifest.get(ref)
+                    if child_entry is None:
+                        return None
+                    reused[ref] = child_entry
+                    ref = child_entry["md_block"]
+                md_child = {**ref, "children": []}
+                md_children.append(md_child)
+                stack.append((ref["children"], md_child["children"]))
+
+        if self.manifest is not None:
+            self.manifest.update(reused)
+        for block_id, entry in reused.items():
+            if entry.get("expiry_time"):
+                self._expiry_times[block_id] = entry["expiry_time"]
+        return md_block
+
+    def _record_md_block(
+        self, block: Dict, md_block: Dict, expiry_time: Optional[str]
+    ) -> None:
+        """Record a markdown block in the manifest for the next run"""
+        version = self._children_version(block)
+        if version is not None and self.manifest is not None:
+            self.manifest[block["id"]] = {
+                "last_edited_time": version,
+                "expiry_time": expiry_time,
+                "md_block": self._manifest_md_block(md_block),
+            }
+
+    def _manifest_md_block(self, md_block: Dict) -> Dict:
+        """Copy a markdown block, referring to children recorded in the
+        manifest by their block id
+
+        Each block is stored once however deep it is nested.
+        """
+        root = {**md_block, "children": []}
+        stack = [(md_block["children"], root["children"])]
+        while stack:
+            md_children, refs = stack.pop()
+            for md_child in md_children:
+                if md_child["block_id"] in self.manifest:
+                    refs.append(md_child["block_id"])
+                    continue
+                ref = {**md_child, "children": []}
+                refs.append(ref)
+                stack.append((md_child["children"], ref["children"]))
+        return root
+
+    def _finish_md_block(
+        self, block: Dict, md_block: Dict, child_blocks: List[Dict]
+    ) -> Dict:
+        """Share a converted synced block and record it in the manifest
+
+        Blocks holding marks of images streamed by this converter are kept
+        to themselves, each mark is streamed once.
+        """
+        expiry_time = earliest_expiry_time(
+            [
+                block_expiry_time(block),
+                *(block_expiry_time(child) for child in child_blocks),
+                *(self._expiry_times.get(child["id"]) for child in child_blocks),
+            ]
+        )
+        if expiry_time is not None:
+            self._expiry_times[block["id"]] = expiry_time
+
+        synced_id = self._synced_source_id(block)
+        stored = synced_id or (
+            self.manifest is not None and self._children_version(block) is not None
+        )
+        if stored and self._holds_deferred_images(md_block):
+            return md_block
+        if synced_id:
+            self.synced_block_cache.set(synced_id, md_block["children"], expiry_time)
+        self._record_md_block(block, md_block, expiry_time)
+        return md_block
+
+    def _cached_synced_children(self, block: Dict) -> Optional[List[Dict]]:
+        """Get the cached children of a synced block copy, unless signed file
+        URLs rendered in them expire
+        """
+        synced_id = self._synced_source_id(block)
+        entry = synced_id and self.synced_block_cache.get_entry(synced_id)
+        if not entry or expires_within(entry[1]):
+            return None
+        if entry[1] is not None:
+            self._expiry_times[block["id"]] = entry[1]
+        return entry[0]
+
+    def _holds_deferred_images(self, md_block: Dict) -> bool:
+        """Check whether a markdown block subtree marks images to stream"""
+        if not self._deferred_images:
+            return False
+        stack = [md_block]
+        while stack:
+            md_block = stack.pop()
+            if DEFERRED_IMAGE_MARK in (md_block["parent"] or ""):
+                return True
+            stack.extend(md_block["children"])
+        return False
+
     def to_markdown_string(
         self,
         md_blocks: List[Dict] = None,
@@ -34,114 +383,527 @@ class NotionToMarkdownBase:
         nesting_level: int = 0,
     ) -> Dict[str, str]:
         """Convert markdown blocks to string"""
-        md_output = {}
+        return {
+            key: _join_chunks(chunks)
+            for key, chunks in self._markdown_chunks(
+                md_blocks, page_identifier, nesting_level
+            ).items()
+        }
+
+    def _markdown_chunks(
+        self,
+        md_blocks: Optional[List[Dict]],
+        page_identifier: str = "parent",
+        nesting_level: int = 0,
+    ) -> Dict[str, List]:
+        """Convert markdown blocks to nested lists of strings, keyed by page
+
+        Children are appended as whole lists so each string is copied once,
+        when the lists are joined. Lists never hold empty strings or lists,
+        so a list is empty exactly when its markdown is. Blocks are walked
+        with an explicit stack, one frame per block whose children are being
+        rendered and the indent of its lines.
+        """
+        result = {}
         if not md_blocks:
-            return md_output
-
-        for block in md_blocks:
-            if block.get("parent") and block.get("type") not in [
-                "toggle",
-                "child_page",
-            ]:
-                if block.get("type") not in [
-                    "to_do",
-                    "bulleted_list_item",
-                    "numbered_list_item",
-                    "quote",
+            return result
+
+        indent = "\t" * nesting_level
+        stack = [(None, page_identifier, indent, iter(md_blocks), result)]
+        while stack:
+            parent, page_identifier, indent, remaining, md_output = stack[-1]
+            for block in remaining:
+                if block.get("parent") and block.get("type") not in [
+                    "toggle",
+                    "child_page",
                 ]:
-                    md_output[page_identifier] = md_output.get(page_identifier, "")
-                    md_output[
-                        page_identifier
-                    ] += f"\n{md.add_tab_space(block['parent'], nesting_level)}\n\n"
-                else:
-                    md_output[page_identifier] = md_output.get(page_identifier, "")
-                    md_output[
-                        page_identifier
-                    ] += f"{md.add_tab_space(block['parent'], nesting_level)}\n"
-
-            if block.get("children"):
-                if block["type"] in ["synced_block", "column_list", "column"]:
-                    md_str = self.to_markdown_string(block["children"], page_identifier)
-                    md_output[page_identifier] = md_output.get(page_identifier, "")
-
-                    for key, value in md_str.items():
-                        md_output[key] = md_output.get(key, "") + value
-
-                elif block["type"] == "child_page":
-                    child_page_title = block["parent"]
-                    md_str = self.to_markdown_string(
-                        block["children"], child_page_title
-                    )
-
-                    if self.config["separate_child_page"]:
-                        md_output.update(md_str)
+                    output = md_output.setdefault(page_identifier, [])
+                    text = md.prefix_lines(block["parent"], indent)
+                    if block.get("type") not in [
+                        "to_do",
+                        "bulleted_list_item",
+                        "numbered_list_item",
+                        "quote",
+                    ]:
+                        output.append(f"\n{text}\n\n")
+                    else:
+                        output.append(f"{text}\n")
+
+                if block.get("children"):
+                    if block["type"] in ["synced_block", "column_list", "column"]:
+                        child_frame = (page_identifier, "")
+                    elif block["type"] == "child_page":
+                        child_frame = (block["parent"], "")
+                    elif block["type"] == "toggle":
+                        child_frame = ("parent", "")
                     else:
-                        md_output[page_identifier] = md_output.get(page_identifier, "")
-                        if md_str.get(child_page_title):
-                            md_output[
-                                page_identifier
-                            ] += f"\n{child_page_title}\n{md_str[child_page_title]}"
-
-                elif block["type"] == "toggle":
-                    toggle_children_md = self.to_markdown_string(block["children"])
-                    md_output[page_identifier] = md_output.get(page_identifier, "")
-                    md_output[page_identifier] += md.toggle(
-                        block["parent"], toggle_children_md.get("parent", "")
+                        child_frame = (page_identifier, indent + "\t")
+                    stack.append((block, *child_frame, iter(block["children"]), {}))
+                    break
+            else:
+                stack.pop()
+                if parent is not None:
+                    _, parent_page, _, _, parent_output = stack[-1]
+                    self._merge_child_chunks(
+                        parent, md_output, parent_page, parent_output
                     )
 
-                else:
-                    md_str = self.to_markdown_string(
-                        block["children"], page_identifier, nesting_level + 1
-                    )
-                    md_output[page_identifier] = md_output.get(page_identifier, "")
+        return result
 
-                    if page_identifier != "parent" and md_str.get("parent"):
-                        md_output[page_identifier] += md_str["parent"]
-                    elif md_str.get(page_identifier):
-                        md_output[page_identifier] += md_str[page_identifier]
+    def _merge_child_chunks(
+        self,
+        block: Dict,
+        md_chunks: Dict[str, List],
+        page_identifier: str,
+        md_output: Dict[str, List],
+    ) -> None:
+        """Add the rendered children of a block to the output of its page"""
+        if block["type"] in ["synced_block", "column_list", "column"]:
+            md_output.setdefault(page_identifier, [])
+            for key, chunks in md_chunks.items():
+                output = md_output.setdefault(key, [])
+                if chunks:
+                    output.append(chunks)
+
+        elif block["type"] == "child_page":
+            child_page_title = block["parent"]
+            if self.config["separate_child_page"]:
+                md_output.update(md_chunks)
+            else:
+                output = md_output.setdefault(page_identifier, [])
+                if md_chunks.get(child_page_title):
+                    output.append(f"\n{child_page_title}\n")
+                    output.append(md_chunks[child_page_title])
+
+        elif block["type"] == "toggle":
+            output = md_output.setdefault(page_identifier, [])
+            children = md_chunks.get("parent")
+            if block["parent"]:
+                start, end = md.toggle_tags(block["parent"])
+                output.append(start)
+                if children:
+                    output.append(children)
+                output.append(end)
+            elif children:
+                output.append(children)
 
-        return md_output
+        else:
+            output = md_output.setdefault(page_identifier, [])
+            if page_identifier != "parent" and md_chunks.get("parent"):
+                output.append(md_chunks["parent"])
+            elif md_chunks.get(page_identifier):
+                output.append(md_chunks[page_identifier])
+
+    def _merge_rich_text(self, rich_text: List[Dict]) -> List[Dict]:
+        """Merge adjacent spans rendered with the same markup and link
+
+        Notion splits edited text into many spans with equal annotations,
+        merging them renders ``**ab**`` instead of ``**a****b**``. Colors
+        are not rendered, so spans differing only in color are merged too.
+        """
+        merged = []
+        runs = []
+        previous = None
+
+        for content in rich_text:
+            if (
+                previous is not None
+                and content.get("href") == previous.get("href")
+                and content.get("type") != "equation"
+                and _same_markup(content.get("annotations"), previous.get("annotations"))
+            ):
+                runs[-1].append(content)
+            else:
+                merged.append(content)
+                runs.append([content])
+            previous = content if content.get("type") != "equation" else None
+
+        return [
+            {**run[0], "plain_text": "".join(span.get("plain_text", "") for span in run)}
+            if len(run) > 1
+            else span
+            for span, run in zip(merged, runs)
+        ]
+
+    def _rich_text_to_markdown(self, rich_text: List[Dict]) -> str:
+        """Render a rich_text array, joining its spans once"""
+        parts = []
+        for content in self._merge_rich_text(rich_text):
+            if content.get("type") == "equation":
+                parts.append(md.inline_equation(content["equation"]["expression"]))
+                continue
 
-    def _apply_annotations(self, plain_text: str, annotations: Dict[str, bool]) -> str:
-        if re.match(r"^\s*$", plain_text):
-            return plain_text
+            plain_text = content.get("plain_text", "")
+            annotations = content.get("annotations")
+            if annotations and any(map(annotations.get, MARKUP_ANNOTATIONS)):
+                plain_text = self._apply_annotations(plain_text, annotations)
 
-        leading_space_match = re.match(r"^(\s*)", plain_text)
-        trailing_space_match = re.search(r"(\s*)$", plain_text)
+            if content.get("href"):
+                plain_text = md.link(plain_text, content["href"])
 
-        leading_space = leading_space_match.group(0) if leading_space_match else ""
-        trailing_space = trailing_space_match.group(0) if trailing_space_match else ""
+            parts.append(plain_text)
+        return "".join(parts)
 
-        plain_text = plain_text.strip()
+    def _apply_annotations(self, plain_text: str, annotations: Dict[str, bool]) -> str:
+        """Apply annotations to plain text, keeping its surrounding whitespace"""
+        stripped = plain_text.strip()
+        if not stripped:
+            return plain_text
+
+        start = len(plain_text) - len(plain_text.lstrip())
+        end = len(plain_text.rstrip())
 
-        if plain_text:
-            """Apply annotations to plain text"""
-            if annotations.get("code"):
-                plain_text = md.inline_code(plain_text)
-            if annotations.get("bold"):
-                plain_text = md.bold(plain_text)
-            if annotations.get("italic"):
-                plain_text = md.italic(plain_text)
-            if annotations.get("strikethrough"):
-                plain_text = md.strikethrough(plain_text)
-            if annotations.get("underline"):
-                plain_text = md.underline(plain_text)
+        if annotations.get("code"):
+            stripped = md.inline_code(stripped)
+        if annotations.get("bold"):
+            stripped = md.bold(stripped)
+        if annotations.get("italic"):
+            stripped = md.italic(stripped)
+        if annotations.get("strikethrough"):
+            stripped = md.strikethrough(stripped)
+        if annotations.get("underline"):
+            stripped = md.underline(stripped)
 
-        return leading_space + plain_text + trailing_space
+        return plain_text[:start] + stripped + plain_text[end:]
 
 
 class NotionToMarkdown(NotionToMarkdownBase):
     def __init__(self, notion_client: Client, config: Dict = None):
         super().__init__(notion_client, config)
+        self._prefetched = None
+        self._images = {}
+        self._http_client_lock = threading.Lock()
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """HTTP client downloading images, pooling connections between them"""
+        if self._http_client is None:
+            # Images are downloaded from executor threads, create one client.
+            with self._http_client_lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client()
+        return self._http_client
+
+    def close(self) -> None:
+        """Close the HTTP client unless it was given in the config"""
+        if self._http_client is not None and self.config["http_client"] is None:
+            self._http_client.close()
+            self._http_client = None
+
+    def __enter__(self) -> "NotionToMarkdown":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def page_to_markdown(
-        self, page_id: str, total_pages: Optional[int] = None
+        self,
+        page_id: str,
+        total_pages: Optional[int] = None,
+        manifest: Optional[Dict] = None,
     ) -> List[Dict]:
-        """Convert a Notion page to markdown blocks"""
-        blocks = get_block_children(self.notion_client, page_id, total_pages)
-        parsed_data = self.block_list_to_markdown(blocks)
+        """Convert a Notion page to markdown blocks
+
+        Subtrees recorded in the manifest of a previous run are reused while
+        their block is unchanged. The manifest of this run is kept in
+        ``self.manifest``.
+        """
+        n2m = self._spawn_conversion()
+        n2m._start_manifest(manifest)
+        blocks = n2m._get_block_children(page_id, total_pages)
+        parsed_data = n2m.block_list_to_markdown(blocks)
+        self.manifest = n2m.manifest
         return parsed_data
 
+    def iter_markdown(
+        self, page_id: str, total_pages: Optional[int] = None
+    ) -> Iterator[str]:
+        """Yield the markdown of a page one top level block at a time
+
+        Only one top level block is held in memory at a time, images
+        converted to base64 are yielded in chunks as they download. Child
+        pages rendered separately with ``separate_child_page`` are left out.
+        """
+        return self._spawn_conversion()._iter_markdown(page_id, total_pages)
+
+    def _iter_markdown(
+        self, page_id: str, total_pages: Optional[int]
+    ) -> Iterator[str]:
+        self._start_manifest(None, record=False)
+        self._deferred_images = {}
+        self._deferred_image_ids = count(1)
+        for block in iter_block_children(
+            self.notion_client, page_id, total_pages, self.config["rate_limiter"]
+        ):
+            md_blocks = self.block_list_to_markdown([block])
+            chunk = self.to_markdown_string(md_blocks).get("parent")
+            if not chunk:
+                continue
+            for part in self._split_deferred_images(chunk):
+                if isinstance(part, str):
+                    yield part
+                else:
+                    yield from self._iter_image_markdown(*part)
+
+    def page_to_markdown_stream(
+        self, page_id: str, sink: IO[str], total_pages: Optional[int] = None
+    ) -> None:
+        """Write the markdown of a page to a file-like sink as it is converted"""
+        for chunk in self.iter_markdown(page_id, total_pages):
+            sink.write(chunk)
+
+    def _get_block_children(
+        self,
+        block_id: str,
+        total_pages: Optional[int] = None,
+        version: Optional[str] = None,
+    ) -> List[Dict]:
+        """Get children of a block, preferring ones fetched on the executor"""
+        if self._prefetched and block_id in self._prefetched:
+            return self._prefetched[block_id]
+        return get_block_children(
+            self.notion_client,
+            block_id,
+            total_pages,
+            self.config["rate_limiter"],
+            self.config["block_cache"],
+            version,
+        )
+
+    def _with_lazy_children(self, block: Dict, total_pages: Optional[int]) -> Dict:
+        """Copy a block with a handle fetching its children on demand"""
+        return {
+            **block,
+            "children": LazyChildren(
+                lambda: self._get_block_children(
+                    self._children_block_id(block),
+                    total_pages,
+                    self._children_version(block),
+                )
+            ),
+        }
+
+    def _resolve_child_blocks(
+        self, block: Dict, total_pages: Optional[int] = None
+    ) -> List[Dict]:
+        """Get the children of a block, through its lazy handle if it has one"""
+        if isinstance(block.get("children"), LazyChildren):
+            return block["children"].get()
+        return self._get_block_children(
+            block["id"], total_pages, block.get("last_edited_time")
+        )
+
+    def _prefetch_children(
+        self, blocks: List[Dict], executor: Executor, total_pages: Optional[int]
+    ) -> Dict[str, List[Dict]]:
+        """Fetch children of the nested blocks level by level on the executor"""
+        prefetched = {}
+        level = blocks
+
+        while level:
+            parents = {}
+            for block in level:
+                if (
+                    self._skip_block(block)
+                    or not block.get("has_children")
+                    or block["type"] in self.custom_transformers
+                    or self._reuse_md_block(block) is not None
+                ):
+                    continue
+                if self._cached_synced_children(block) is not None:
+                    continue
+                block_id = self._children_block_id(block)
+                if block_id not in prefetched:
+                    parents.setdefault(block_id, block)
+
+            results = executor.map(
+                lambda item: get_block_children(
+                    self.notion_client,
+                    item[0],
+                    total_pages,
+                    self.config["rate_limiter"],
+                    self.config["block_cache"],
+                    self._children_version(item[1]),
+                ),
+                parents.items(),
+            )
+
+            level = []
+            for block_id, child_blocks in zip(parents, results):
+                prefetched[block_id] = child_blocks
+                level.extend(child_blocks)
+
+        return prefetched
+
+    def _prefetch_images(
+        self, blocks: List[Dict], executor: Executor
+    ) -> Dict[str, bytes]:
+        """Download the images of the prefetched block tree on the executor"""
+        links = self._media_links(
+            [
+                block
+                for child_blocks in [blocks, *self._prefetched.values()]
+                for block in child_blocks
+            ]
+        )
+        max_size = self.config["max_inline_image_size"]
+
+        def download(link: str) -> Optional[bytes]:
+            try:
+                return b"".join(self._iter_image_data(link, links[link], max_size))
+            except (httpx.HTTPError, ImageTooLarge):
+                # Left for block_to_markdown to download or link.
+                return None
+
+        return {
+            link: data
+            for link, data in zip(links, executor.map(download, links))
+            if data is not None
+        }
+
+    def _prefetch_assets(self, blocks: List[Dict], executor: Executor) -> None:
+        """Download the media files of the prefetched block tree to assets_dir"""
+        links = self._media_links(
+            [
+                block
+                for child_blocks in [blocks, *self._prefetched.values()]
+                for block in child_blocks
+            ]
+        )
+        links = {
+            link: block_id
+            for link, block_id in links.items()
+            if link not in self._assets
+        }
+
+        def download(link: str) -> Optional[str]:
+            try:
+                return self._download_asset(link, links[link])
+            except httpx.HTTPError:
+                # Left for block_to_markdown to download.
+                return None
+
+        for link, name in zip(links, executor.map(download, links)):
+            if name is not None:
+                self._assets[link] = name
+
+    def _download_asset(self, link: str, block_id: Optional[str]) -> str:
+        """Download a file to assets_dir, returning its name there"""
+        asset = AssetFile(self.config["assets_dir"], link)
+        try:
+            for chunk in self._iter_image_data(link, block_id):
+                asset.write(chunk)
+        except BaseException:
+            asset.discard()
+            raise
+        return asset.commit()
+
+    def _asset_link(self, link: str, block_id: Optional[str]) -> str:
+        """Get the path to link to a media file by, downloading it once
+
+        Files whose download fails with an error status keep their URL.
+        """
+        if link not in self._assets:
+            try:
+                self._assets[link] = self._download_asset(link, block_id)
+            except httpx.HTTPStatusError:
+                return link
+        return self._asset_path(self._assets[link])
+
+    def _iter_image_data(
+        self, link: str, block_id: Optional[str], max_size: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Yield the bytes of an image from the prefetched ones, cache or network
+
+        ImageTooLarge is raised before anything is yielded for images over
+        max_size bytes, and httpx.HTTPStatusError for error responses.
+        """
+        cache = self.config["image_cache"]
+        data = self._images.get(link)
+        if data is None and cache is not None:
+            data = cache.get(link, block_id)
+        if data is not None:
+            if self._too_large(len(data), max_size):
+                raise ImageTooLarge(link)
+            yield data
+            return
+
+        with self.http_client.stream("GET", link) as response:
+            response.raise_for_status()
+            length = response.headers.get("content-length")
+            if self._too_large(length, max_size):
+                raise ImageTooLarge(link)
+
+            chunks = response.iter_bytes()
+            if length is None and max_size is not None:
+                # Without a length, buffer up to the limit to check the size.
+                buffered = bytearray()
+                for chunk in chunks:
+                    buffered += chunk
+                    if self._too_large(len(buffered), max_size):
+                        raise ImageTooLarge(link)
+                chunks = [bytes(buffered)]
+
+            downloaded = [] if cache is not None else None
+            for chunk in chunks:
+                if downloaded is not None:
+                    downloaded.append(chunk)
+                yield chunk
+
+        if downloaded is not None:
+            cache.set(link, block_id, b"".join(downloaded))
+
+    def _iter_image_markdown(
+        self, title: str, link: str, block_id: Optional[str]
+    ) -> Iterator[str]:
+        """Yield the markdown of an image, encoding its data as it downloads"""
+        chunks = self._iter_image_data(
+            link, block_id, self.config["max_inline_image_size"]
+        )
+        try:
+            first = next(chunks, b"")
+        except (httpx.HTTPStatusError, ImageTooLarge):
+            yield md.image(title, link)
+            return
+        yield from md.image_stream(title, chain([first], chunks))
+
+    def _walk_on_executor(
+        self, blocks: List[Dict], total_pages: Optional[int], md_blocks: List[Dict]
+    ) -> List[Dict]:
+        """Prefetch the block tree on a thread pool, then convert it in order
+
+        The prefetched blocks are kept on a converter of this walk, sharing
+        the manifest and streamed images of this one.
+        """
+        walker = self._spawn()
+        walker.manifest = self.manifest
+        walker._previous_manifest = self._previous_manifest
+        walker._expiry_times = self._expiry_times
+        walker._deferred_images = self._deferred_images
+        walker._deferred_image_ids = self._deferred_image_ids
+
+        executor = self.config["executor"]
+        own_executor = executor is None
+        if own_executor:
+            executor = futures.ThreadPoolExecutor(self.config["max_concurrency"])
+
+        try:
+            walker._prefetched = walker._prefetch_children(
+                blocks, executor, total_pages
+            )
+            if self.config["assets_dir"]:
+                walker._prefetch_assets(blocks, executor)
+            elif (
+                self.config["convert_images_to_base64"]
+                and self._deferred_images is None
+            ):
+                walker._images = walker._prefetch_images(blocks, executor)
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        return walker.block_list_to_markdown(blocks, total_pages, md_blocks)
+
     def block_list_to_markdown(
         self,
         blocks: List[Dict] = None,
@@ -154,56 +916,110 @@ class NotionToMarkdown(NotionToMarkdownBase):
         if not blocks:
             return md_blocks
 
-        for block in blocks:
-            if block["type"] == "unsupported" or (
-                block["type"] == "child_page" and not self.config["parse_child_pages"]
-            ):
-                continue
+        if self._prefetched is None and (
+            self.config["executor"] is not None or self.config["max_concurrency"] > 1
+        ):
+            return self._walk_on_executor(blocks, total_pages, md_blocks)
 
-            if block.get("has_children"):
-                block_id = (
-                    block["synced_block"]["synced_from"]["block_id"]
-                    if (
-                        block["type"] == "synced_block"
-                        and block["synced_block"].get("synced_from")
-                    )
-                    else block["id"]
-                )
+        return self._walk_blocks(blocks, total_pages, md_blocks)
 
-                child_blocks = get_block_children(
-                    self.notion_client, block_id, total_pages
+    def _walk_blocks(
+        self, blocks: List[Dict], total_pages: Optional[int], md_blocks: List[Dict]
+    ) -> List[Dict]:
+        """Convert blocks and their descendants depth first
+
+        The stack holds a frame for each block whose children are being
+        converted, so the Python stack stays flat however deep blocks nest.
+        """
+        stack = [(None, blocks, iter(blocks), md_blocks)]
+        while stack:
+            block, child_blocks, remaining, md_children = stack[-1]
+            for child in remaining:
+                if self._skip_block(child):
+                    continue
+                md_block = self._shallow_md_block(child, total_pages)
+                if md_block is not None:
+                    md_children.append(md_block)
+                    continue
+                grandchildren = self._get_block_children(
+                    self._children_block_id(child),
+                    total_pages,
+                    self._children_version(child),
                 )
-
-                md_blocks.append(
-                    {
+                stack.append((child, grandchildren, iter(grandchildren), []))
+                break
+            else:
+                stack.pop()
+                if block is not None:
+                    md_block = {
                         "type": block["type"],
                         "block_id": block["id"],
-                        "parent": self.block_to_markdown(block),
-                        "children": [],
+                        "parent": self.block_to_markdown(
+                            block, child_blocks, md_children
+                        ),
+                        "children": md_children,
                     }
-                )
-
-                if not (block["type"] in self.custom_transformers):
-                    self.block_list_to_markdown(
-                        child_blocks,
-                        total_pages,
-                        md_blocks[-1]["children"],
+                    stack[-1][3].append(
+                        self._finish_md_block(block, md_block, child_blocks)
                     )
-                continue
-
-            md_blocks.append(
-                {
-                    "type": block["type"],
-                    "block_id": block["id"],
-                    "parent": self.block_to_markdown(block),
-                    "children": [],
-                }
-            )
 
         return md_blocks
 
-    def block_to_markdown(self, block: Dict) -> str:
-        """Convert a single Notion block to markdown"""
+    def _shallow_md_block(
+        self, block: Dict, total_pages: Optional[int] = None
+    ) -> Optional[Dict]:
+        """Convert a block without converting its children
+
+        Returns None for blocks whose children have to be converted first.
+        """
+        if not block.get("has_children"):
+            return {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": self.block_to_markdown(block),
+                "children": [],
+            }
+
+        reused = self._reuse_md_block(block)
+        if reused is not None:
+            return reused
+
+        synced_children = self._cached_synced_children(block)
+        if synced_children is not None:
+            return {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": self.block_to_markdown(block),
+                "children": synced_children,
+            }
+
+        if block["type"] in self.custom_transformers:
+            # Transformers fetch the children through the handle if they
+            # need them, so none are requested up front.
+            md_block = {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": self.block_to_markdown(
+                    self._with_lazy_children(block, total_pages)
+                ),
+                "children": [],
+            }
+            return self._finish_md_block(block, md_block, [])
+
+        return None
+
+    def block_to_markdown(
+        self,
+        block: Dict,
+        child_blocks: Optional[List[Dict]] = None,
+        md_children: Optional[List[Dict]] = None,
+    ) -> str:
+        """Convert a single Notion block to markdown
+
+        Tables and callouts with children use the already fetched
+        ``child_blocks`` (and converted ``md_children``) when given, and fetch
+        them otherwise.
+        """
         if not isinstance(block, dict) or "type" not in block:
             return ""
 
@@ -223,12 +1039,7 @@ class NotionToMarkdown(NotionToMarkdownBase):
                 item.get("plain_text", "") for item in block_content.get("caption", [])
             )
 
-            image_type = block_content["type"]
-            link = (
-                block_content["external"]["url"]
-                if image_type == "external"
-                else block_content["file"]["url"]
-            )
+            link = self._media_link(block_content)
 
             image_title = (
                 image_caption_plain.strip() or link.split("/")[-1]
@@ -236,7 +1047,16 @@ class NotionToMarkdown(NotionToMarkdownBase):
                 else image_title
             )
 
-            return md.image(image_title, link, self.config["convert_images_to_base64"])
+            if link.startswith("data:"):
+                return md.image(image_title, link)
+            block_id = self._file_block_id(block)
+            if self.config["assets_dir"]:
+                return md.image(image_title, self._asset_link(link, block_id))
+            if not self.config["convert_images_to_base64"]:
+                return md.image(image_title, link)
+            return self._defer_image(image_title, link, block_id) or "".join(
+                self._iter_image_markdown(image_title, link, block_id)
+            )
 
         elif block_type == "divider":
             return md.divider()
@@ -262,6 +1082,8 @@ class NotionToMarkdown(NotionToMarkdownBase):
                 )
 
                 title = caption.strip() or link.split("/")[-1] if "/" in link else title
+                if self.config["assets_dir"] and not link.startswith("data:"):
+                    link = self._asset_link(link, self._file_block_id(block))
                 return md.link(title, link)
 
         elif block_type in ["bookmark", "embed", "link_preview", "link_to_page"]:
@@ -300,8 +1122,9 @@ class NotionToMarkdown(NotionToMarkdownBase):
             table_rows = []
 
             if block.get("has_children"):
-                table_children = get_block_children(self.notion_client, block["id"])
-                for child in table_children:
+                if child_blocks is None:
+                    child_blocks = self._resolve_child_blocks(block)
+                for child in child_blocks:
                     if child["type"] == "table_row":
                         cells = child["table_row"].get("cells", [])
 
@@ -316,7 +1139,7 @@ class NotionToMarkdown(NotionToMarkdownBase):
                         ]
                         table_rows.append(row_content)
 
-            return md.table(table_rows)
+            return md.table(table_rows, self.config["use_pytablewriter"])
 
         else:
             # Rest of the types
@@ -345,20 +1168,7 @@ class NotionToMarkdown(NotionToMarkdownBase):
             if not block_content:
                 block_content = block_data.get("rich_text", [])
 
-            for content in block_content:
-                if content.get("type") == "equation":
-                    parsed_data += md.inline_equation(content["equation"]["expression"])
-                    continue
-
-                plain_text = content.get("plain_text", "")
-                annotations = content.get("annotations", {})
-
-                plain_text = self._apply_annotations(plain_text, annotations)
-
-                if content.get("href"):
-                    plain_text = md.link(plain_text, content["href"])
-
-                parsed_data += plain_text
+            parsed_data = self._rich_text_to_markdown(block_content)
 
         if block_type == "code":
             return md.code_block(parsed_data, block["code"]["language"])
@@ -376,19 +1186,17 @@ class NotionToMarkdown(NotionToMarkdownBase):
             return md.quote(parsed_data)
 
         elif block_type == "callout":
-            callout_string = ""
             if not block["has_children"]:
-                return md.callout(callout_string, block["callout"].get("icon"))
+                return md.callout("", block["callout"].get("icon"))
 
-            callout_children_object = get_block_children(
-                self.notion_client, block["id"], 100
-            )
-            callout_children = self.block_list_to_markdown(callout_children_object)
-
-            callout_string += f"{parsed_data}\n"
-            for child in callout_children:
-                callout_string += f"{child['parent']}\n\n"
+            if md_children is None:
+                if child_blocks is None:
+                    child_blocks = self._resolve_child_blocks(block, 100)
+                md_children = self.block_list_to_markdown(child_blocks)
 
+            callout_string = "".join(
+                [f"{parsed_data}\n", *(f"{child['parent']}\n\n" for child in md_children)]
+            )
             return md.callout(callout_string.strip(), block["callout"].get("icon"))
 
         elif block_type == "bulleted_list_item":
@@ -402,19 +1210,318 @@ class NotionToMarkdown(NotionToMarkdownBase):
         return parsed_data
 
 
+async def _aiter_once(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
 class NotionToMarkdownAsync(NotionToMarkdownBase):
     def __init__(self, notion_client: AsyncClient, config: Dict = None):
         super().__init__(notion_client, config)
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._synced_renders = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """HTTP client downloading images, pooling connections between them"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient()
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """Close the HTTP client unless it was given in the config"""
+        if self._http_client is not None and self.config["http_client"] is None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def __aenter__(self) -> "NotionToMarkdownAsync":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
 
     async def page_to_markdown(
+        self,
+        page_id: str,
+        total_pages: Optional[int] = None,
+        manifest: Optional[Dict] = None,
+    ) -> List[Dict]:
+        """Convert a Notion page to markdown blocks
+
+        Subtrees recorded in the manifest of a previous run are reused while
+        their block is unchanged. The manifest of this run is kept in
+        ``self.manifest``.
+        """
+        n2m = self._spawn_conversion()
+        n2m._start_manifest(manifest)
+        if self.config["max_concurrency"] > 1:
+            parsed_data = await n2m._stream_page_to_markdown(page_id, total_pages)
+        else:
+            blocks = await n2m._get_block_children(page_id, total_pages)
+            parsed_data = await n2m.block_list_to_markdown(blocks)
+        self.manifest = n2m.manifest
+        return parsed_data
+
+    async def _stream_page_to_markdown(
         self, page_id: str, total_pages: Optional[int] = None
     ) -> List[Dict]:
-        """Convert a Notion page to markdown blocks"""
-        blocks = await get_block_children_async(
-            self.notion_client, page_id, total_pages
+        """Convert the blocks of a page while its next pages are fetched"""
+        tasks = []
+        try:
+            async for block in aiter_block_children(
+                self.notion_client, page_id, total_pages, self.config["rate_limiter"]
+            ):
+                if not self._skip_block(block):
+                    tasks.append(asyncio.ensure_future(self._block_to_md_block(block)))
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def iter_markdown(
+        self, page_id: str, total_pages: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Yield the markdown of a page one top level block at a time
+
+        Up to ``max_concurrency`` top level blocks are converted at a time,
+        images converted to base64 are yielded in chunks as they download.
+        Child pages rendered separately with ``separate_child_page`` are left
+        out.
+        """
+        return self._spawn_conversion()._iter_markdown(page_id, total_pages)
+
+    async def _iter_markdown(
+        self, page_id: str, total_pages: Optional[int]
+    ) -> AsyncIterator[str]:
+        self._start_manifest(None, record=False)
+        self._deferred_images = {}
+        self._deferred_image_ids = count(1)
+        pending = deque()
+        try:
+            async for block in aiter_block_children(
+                self.notion_client, page_id, total_pages, self.config["rate_limiter"]
+            ):
+                if self._skip_block(block):
+                    continue
+                pending.append(asyncio.ensure_future(self._block_to_md_block(block)))
+                if len(pending) >= self.config["max_concurrency"]:
+                    chunk = self._md_block_to_chunk(await pending.popleft())
+                    async for part in self._stream_chunk(chunk):
+                        yield part
+
+            while pending:
+                chunk = self._md_block_to_chunk(await pending.popleft())
+                async for part in self._stream_chunk(chunk):
+                    yield part
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def database_to_markdown(
+        self, database_id: str, concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Dict, List[Dict]]]:
+        """Convert every row page of a database, yielding (page, md_blocks)
+
+        Rows are converted as the database query pages arrive, up to
+        ``concurrency`` (by default ``max_concurrency``) at a time, and are
+        yielded in the order they complete.
+        """
+        concurrency = concurrency or self.config["max_concurrency"]
+        in_flight = set()
+        # Rows share the synced block originals of this call.
+        rows = self._spawn_conversion()
+
+        async def convert(page: Dict) -> Tuple[Dict, List[Dict]]:
+            return page, await rows.page_to_markdown(page["id"])
+
+        try:
+            async for page in aiter_database_pages(
+                self.notion_client, database_id, self.config["rate_limiter"]
+            ):
+                in_flight.add(asyncio.ensure_future(convert(page)))
+                if len(in_flight) >= concurrency:
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+
+            while in_flight:
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    def _md_block_to_chunk(self, md_block: Dict) -> Optional[str]:
+        """Render a top level markdown block of a page"""
+        return self.to_markdown_string([md_block]).get("parent")
+
+    async def _stream_chunk(self, chunk: Optional[str]) -> AsyncIterator[str]:
+        """Yield a chunk, streaming the images deferred in it"""
+        if not chunk:
+            return
+        for part in self._split_deferred_images(chunk):
+            if isinstance(part, str):
+                yield part
+            else:
+                async for text in self._aiter_image_markdown(*part):
+                    yield text
+
+    async def page_to_markdown_stream(
+        self, page_id: str, sink: IO[str], total_pages: Optional[int] = None
+    ) -> None:
+        """Write the markdown of a page to a file-like sink as it is converted"""
+        async for chunk in self.iter_markdown(page_id, total_pages):
+            sink.write(chunk)
+
+    def _fetch_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent fetches on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore_loop = loop
+            self._semaphore = asyncio.Semaphore(self.config["max_concurrency"])
+        return self._semaphore
+
+    async def _aiter_image_data(
+        self, link: str, block_id: Optional[str], max_size: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the bytes of an image from the cache or network
+
+        ImageTooLarge is raised before anything is yielded for images over
+        max_size bytes, and httpx.HTTPStatusError for error responses.
+        """
+        cache = self.config["image_cache"]
+        if cache is not None:
+            data = cache.get(link, block_id)
+            if data is not None:
+                if self._too_large(len(data), max_size):
+                    raise ImageTooLarge(link)
+                yield data
+                return
+
+        async with self._fetch_semaphore():
+            async with self.http_client.stream("GET", link) as response:
+                response.raise_for_status()
+                length = response.headers.get("content-length")
+                if self._too_large(length, max_size):
+                    raise ImageTooLarge(link)
+
+                chunks = response.aiter_bytes()
+                if length is None and max_size is not None:
+                    # Without a length, buffer up to the limit to check the size.
+                    buffered = bytearray()
+                    async for chunk in chunks:
+                        buffered += chunk
+                        if self._too_large(len(buffered), max_size):
+                            raise ImageTooLarge(link)
+                    chunks = _aiter_once(bytes(buffered))
+
+                downloaded = [] if cache is not None else None
+                async for chunk in chunks:
+                    if downloaded is not None:
+                        downloaded.append(chunk)
+                    yield chunk
+
+        if downloaded is not None:
+            cache.set(link, block_id, b"".join(downloaded))
+
+    async def _download_asset(self, link: str, block_id: Optional[str]) -> str:
+        """Download a file to assets_dir, returning its name there"""
+        asset = AssetFile(self.config["assets_dir"], link)
+        try:
+            async for chunk in self._aiter_image_data(link, block_id):
+                asset.write(chunk)
+        except BaseException:
+            asset.discard()
+            raise
+        return asset.commit()
+
+    async def _asset_link(self, link: str, block_id: Optional[str]) -> str:
+        """Get the path to link to a media file by, downloading it once
+
+        Blocks converted concurrently share the download of the same URL.
+        Files whose download fails with an error status keep their URL.
+        """
+        download = self._assets.get(link)
+        if download is None:
+            download = asyncio.ensure_future(self._download_asset(link, block_id))
+            self._assets[link] = download
+        try:
+            return self._asset_path(await asyncio.shield(download))
+        except BaseException as error:
+            if download.done() and self._assets.get(link) is download:
+                del self._assets[link]
+            if isinstance(error, httpx.HTTPStatusError):
+                return link
+            raise
+
+    async def _aiter_image_markdown(
+        self, title: str, link: str, block_id: Optional[str]
+    ) -> AsyncIterator[str]:
+        """Yield the markdown of an image, encoding its data as it downloads"""
+        chunks = self._aiter_image_data(
+            link, block_id, self.config["max_inline_image_size"]
+        )
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b""
+        except (httpx.HTTPStatusError, ImageTooLarge):
+            yield md.image(title, link)
+            return
+
+        yield md.image_data_start(title)
+        rest = first
+        async for chunk in chunks:
+            encoded, rest = md.encode_base64_chunk(rest + chunk)
+            if encoded:
+                yield encoded
+        yield md.image_data_end(rest)
+
+    async def _get_block_children(
+        self,
+        block_id: str,
+        total_pages: Optional[int] = None,
+        version: Optional[str] = None,
+    ) -> List[Dict]:
+        """Get children of a block, bounded by the configured concurrency"""
+        async with self._fetch_semaphore():
+            return await get_block_children_async(
+                self.notion_client,
+                block_id,
+                total_pages,
+                self.config["rate_limiter"],
+                self.config["block_cache"],
+                version,
+            )
+
+    def _with_lazy_children(self, block: Dict, total_pages: Optional[int]) -> Dict:
+        """Copy a block with a handle fetching its children on demand"""
+        return {
+            **block,
+            "children": AsyncLazyChildren(
+                lambda: self._get_block_children(
+                    self._children_block_id(block),
+                    total_pages,
+                    self._children_version(block),
+                )
+            ),
+        }
+
+    async def _resolve_child_blocks(
+        self, block: Dict, total_pages: Optional[int] = None
+    ) -> List[Dict]:
+        """Get the children of a block, through its lazy handle if it has one"""
+        if isinstance(block.get("children"), AsyncLazyChildren):
+            return await block["children"].get()
+        return await self._get_block_children(
+            block["id"], total_pages, block.get("last_edited_time")
         )
-        parsed_data = await self.block_list_to_markdown(blocks)
-        return parsed_data
 
     async def block_list_to_markdown(
         self,
@@ -428,52 +1535,178 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
         if not blocks:
             return md_blocks
 
-        for block in blocks:
-            if block["type"] == "unsupported" or (
-                block["type"] == "child_page" and not self.config["parse_child_pages"]
-            ):
-                continue
+        blocks = [block for block in blocks if not self._skip_block(block)]
 
-            if block.get("has_children"):
-                block_id = (
-                    block["synced_block"]["synced_from"]["block_id"]
-                    if block["type"] == "synced_block"
-                    and block["synced_block"].get("synced_from")
-                    else block["id"]
+        if self.config["max_concurrency"] > 1:
+            # Siblings (and their subtrees) are fetched concurrently, gather
+            # keeps the results in document order.
+            md_blocks.extend(
+                await asyncio.gather(
+                    *(self._block_to_md_block(block, total_pages) for block in blocks)
                 )
+            )
+            return md_blocks
 
-                child_blocks = await get_block_children_async(
-                    self.notion_client, block_id, total_pages
-                )
+        return await self._walk_blocks(blocks, total_pages, md_blocks)
 
-                md_blocks.append(
-                    {
+    async def _walk_blocks(
+        self, blocks: List[Dict], total_pages: Optional[int], md_blocks: List[Dict]
+    ) -> List[Dict]:
+        """Convert blocks and their descendants depth first, one at a time
+
+        The stack holds a frame for each block whose children are being
+        converted, so the Python stack stays flat however deep blocks nest.
+        """
+        stack = [(None, blocks, iter(blocks), md_blocks)]
+        while stack:
+            block, child_blocks, remaining, md_children = stack[-1]
+            for child in remaining:
+                if self._skip_block(child):
+                    continue
+                md_block = await self._shallow_md_block(child, total_pages)
+                if md_block is not None:
+                    md_children.append(md_block)
+                    continue
+                grandchildren = await self._get_block_children(
+                    self._children_block_id(child),
+                    total_pages,
+                    self._children_version(child),
+                )
+                stack.append((child, grandchildren, iter(grandchildren), []))
+                break
+            else:
+                stack.pop()
+                if block is not None:
+                    md_block = {
                         "type": block["type"],
                         "block_id": block["id"],
-                        "parent": await self.block_to_markdown(block),
-                        "children": [],
+                        "parent": await self.block_to_markdown(
+                            block, child_blocks, md_children
+                        ),
+                        "children": md_children,
                     }
-                )
-
-                if not (block["type"] in self.custom_transformers):
-                    await self.block_list_to_markdown(
-                        child_blocks, total_pages, md_blocks[-1]["children"]
+                    stack[-1][3].append(
+                        self._finish_md_block(block, md_block, child_blocks)
                     )
-                continue
-
-            md_blocks.append(
-                {
-                    "type": block["type"],
-                    "block_id": block["id"],
-                    "parent": await self.block_to_markdown(block),
-                    "children": [],
-                }
-            )
 
         return md_blocks
 
-    async def block_to_markdown(self, block: Dict) -> str:
-        """Convert a single Notion block to markdown"""
+    async def _block_to_md_block(
+        self, block: Dict, total_pages: Optional[int] = None
+    ) -> Dict:
+        """Convert a Notion block and its children to a markdown block
+
+        Children converted concurrently run in their own tasks, so nesting
+        does not deepen the Python stack of any one task.
+        """
+        md_block = await self._shallow_md_block(block, total_pages)
+        if md_block is not None:
+            return md_block
+
+        # Copies of a synced block converted at the same time share one
+        # conversion of the children of their original.
+        synced_id = self._synced_source_id(block)
+        render = self._synced_renders.get(synced_id) if synced_id else None
+        leader = synced_id is not None and render is None
+        if leader:
+            render = asyncio.ensure_future(self._convert_children(block, total_pages))
+            self._synced_renders[synced_id] = render
+
+        try:
+            if render is None:
+                child_blocks, md_children = await self._convert_children(
+                    block, total_pages
+                )
+            else:
+                child_blocks, md_children = await asyncio.shield(render)
+                if not leader and self._holds_deferred_images(
+                    {"parent": None, "children": md_children}
+                ):
+                    # Each mark of a streamed image is streamed once.
+                    child_blocks, md_children = await self._convert_children(
+                        block, total_pages
+                    )
+
+            md_block = {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": await self.block_to_markdown(
+                    block, child_blocks, md_children
+                ),
+                "children": md_children,
+            }
+            return self._finish_md_block(block, md_block, child_blocks)
+        finally:
+            if leader:
+                del self._synced_renders[synced_id]
+
+    async def _convert_children(
+        self, block: Dict, total_pages: Optional[int]
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Fetch and convert the children of a block"""
+        child_blocks = await self._get_block_children(
+            self._children_block_id(block),
+            total_pages,
+            self._children_version(block),
+        )
+        md_children = await self.block_list_to_markdown(child_blocks, total_pages)
+        return child_blocks, md_children
+
+    async def _shallow_md_block(
+        self, block: Dict, total_pages: Optional[int] = None
+    ) -> Optional[Dict]:
+        """Convert a block without converting its children
+
+        Returns None for blocks whose children have to be converted first.
+        """
+        if not block.get("has_children"):
+            return {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": await self.block_to_markdown(block),
+                "children": [],
+            }
+
+        reused = self._reuse_md_block(block)
+        if reused is not None:
+            return reused
+
+        synced_children = self._cached_synced_children(block)
+        if synced_children is not None:
+            return {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": await self.block_to_markdown(block),
+                "children": synced_children,
+            }
+
+        if block["type"] in self.custom_transformers:
+            # Transformers fetch the children through the handle if they
+            # need them, so none are requested up front.
+            md_block = {
+                "type": block["type"],
+                "block_id": block["id"],
+                "parent": await self.block_to_markdown(
+                    self._with_lazy_children(block, total_pages)
+                ),
+                "children": [],
+            }
+            return self._finish_md_block(block, md_block, [])
+
+        return None
+
+    async def block_to_markdown(
+        self,
+        block: Dict,
+        child_blocks: Optional[List[Dict]] = None,
+        md_children: Optional[List[Dict]] = None,
+    ) -> str:
+        """Convert a single Notion block to markdown
+
+        Tables and callouts with children use the already fetched
+        ``child_blocks`` (and converted ``md_children``) when given, and fetch
+        them otherwise.
+        """
         if not isinstance(block, dict) or "type" not in block:
             return ""
 
@@ -493,12 +1726,7 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
                 item.get("plain_text", "") for item in block_content.get("caption", [])
             )
 
-            image_type = block_content["type"]
-            link = (
-                block_content["external"]["url"]
-                if image_type == "external"
-                else block_content["file"]["url"]
-            )
+            link = self._media_link(block_content)
 
             image_title = (
                 image_caption_plain.strip() or link.split("/")[-1]
@@ -506,8 +1734,23 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
                 else image_title
             )
 
-            return await md.image_async(
-                image_title, link, self.config["convert_images_to_base64"]
+            if link.startswith("data:"):
+                return md.image(image_title, link)
+            block_id = self._file_block_id(block)
+            if self.config["assets_dir"]:
+                return md.image(image_title, await self._asset_link(link, block_id))
+            if not self.config["convert_images_to_base64"]:
+                return md.image(image_title, link)
+            deferred = self._defer_image(image_title, link, block_id)
+            if deferred:
+                return deferred
+            return "".join(
+                [
+                    text
+                    async for text in self._aiter_image_markdown(
+                        image_title, link, block_id
+                    )
+                ]
             )
 
         elif block_type == "divider":
@@ -534,6 +1777,8 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
                 )
 
                 title = caption.strip() or link.split("/")[-1] if "/" in link else title
+                if self.config["assets_dir"] and not link.startswith("data:"):
+                    link = await self._asset_link(link, self._file_block_id(block))
                 return md.link(title, link)
 
         elif block_type in ["bookmark", "embed", "link_preview", "link_to_page"]:
@@ -572,10 +1817,9 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
             table_rows = []
 
             if block.get("has_children"):
-                table_children = await get_block_children_async(
-                    self.notion_client, block["id"]
-                )
-                for child in table_children:
+                if child_blocks is None:
+                    child_blocks = await self._resolve_child_blocks(block)
+                for child in child_blocks:
                     if child["type"] == "table_row":
                         cells = child["table_row"].get("cells", [])
 
@@ -590,7 +1834,7 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
                         ]
                         table_rows.append(row_content)
 
-            return md.table(table_rows)
+            return md.table(table_rows, self.config["use_pytablewriter"])
 
         else:
             # Rest of the types
@@ -619,20 +1863,7 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
             if not block_content:
                 block_content = block_data.get("rich_text", [])
 
-            for content in block_content:
-                if content.get("type") == "equation":
-                    parsed_data += md.inline_equation(content["equation"]["expression"])
-                    continue
-
-                plain_text = content.get("plain_text", "")
-                annotations = content.get("annotations", {})
-
-                plain_text = self._apply_annotations(plain_text, annotations)
-
-                if content.get("href"):
-                    plain_text = md.link(plain_text, content["href"])
-
-                parsed_data += plain_text
+            parsed_data = self._rich_text_to_markdown(block_content)
 
         if block_type == "code":
             return md.code_block(parsed_data, block["code"]["language"])
@@ -650,21 +1881,17 @@ class NotionToMarkdownAsync(NotionToMarkdownBase):
             return md.quote(parsed_data)
 
         elif block_type == "callout":
-            callout_string = ""
             if not block["has_children"]:
-                return md.callout(callout_string, block["callout"].get("icon"))
+                return md.callout("", block["callout"].get("icon"))
 
-            callout_children_object = await get_block_children_async(
-                self.notion_client, block["id"], 100
-            )
-            callout_children = await self.block_list_to_markdown(
-                callout_children_object
-            )
-
-            callout_string += f"{parsed_data}\n"
-            for child in callout_children:
-                callout_string += f"{child['parent']}\n\n"
+            if md_children is None:
+                if child_blocks is None:
+                    child_blocks = await self._resolve_child_blocks(block, 100)
+                md_children = await self.block_list_to_markdown(child_blocks)
 
+            callout_string = "".join(
+                [f"{parsed_data}\n", *(f"{child['parent']}\n\n" for child in md_children)]
+            )
             return md.callout(callout_string.strip(), block["callout"].get("icon"))
 
         elif block_type == "bulleted_list_item":
@@ -1,24 +1,143 @@
-import asyncio
-from notion_client import Client
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterable, Iterator, Tuple
 from .base import NotionToMarkdown, NotionToMarkdownAsync
+from .utils.cache import SyncedBlockCache
+from .utils.lazy import LazyModule
+from .utils.notion import iter_database_pages
+
+if TYPE_CHECKING:
+    import asyncio
+    import httpx
+    from concurrent import futures
+    from notion_client import Client
+else:
+    asyncio = LazyModule("asyncio")
+    httpx = LazyModule("httpx")
+    futures = LazyModule("concurrent.futures")
 
 
 class MarkdownProvider:
-    def __init__(self, notion: Client):
+    def __init__(self, notion: Client, config: Dict = None):
         self.notion = notion
+        # Caches in the config are shared by every page converted here.
+        self.config = config or {}
 
     def get_markdown_string(self, page_id: str) -> str:
-        n2m = NotionToMarkdown(self.notion)
+        return self._get_markdown_string(page_id, self.config)
 
-        md_blocks = n2m.page_to_markdown(page_id)
-        md_str = n2m.to_markdown_string(md_blocks).get("parent")
+    def _get_markdown_string(self, page_id: str, config: Dict) -> str:
+        n2m = NotionToMarkdown(self.notion, config)
+
+        try:
+            md_blocks = n2m.page_to_markdown(page_id)
+            md_str = n2m.to_markdown_string(md_blocks).get("parent")
+        finally:
+            n2m.close()
 
         return md_str
 
     def get_markdown_string_async(self, page_id: str) -> str:
-        n2m = NotionToMarkdownAsync(self.notion)
+        return asyncio.run(self._get_markdown_string_async(page_id, self.config))
+
+    async def _get_markdown_string_async(self, page_id: str, config: Dict) -> str:
+        n2m = NotionToMarkdownAsync(self.notion, config)
 
-        md_blocks = asyncio.run(n2m.page_to_markdown(page_id))
-        md_str = n2m.to_markdown_string(md_blocks).get("parent")
+        try:
+            md_blocks = await n2m.page_to_markdown(page_id)
+            md_str = n2m.to_markdown_string(md_blocks).get("parent")
+        finally:
+            await n2m.aclose()
 
         return md_str
+
+    def export_many(
+        self, page_ids: Iterable[str], concurrency: int = 4
+    ) -> Iterator[Tuple[str, str]]:
+        """Convert pages on a thread pool, yielding (page_id, markdown) as they complete
+
+        Page ids are taken as pages complete, at most two per thread ahead, so
+        a lazy iterable such as a database query is not drained up front.
+        """
+        # Pages of one export share a synced block cache and one HTTP client.
+        config = {"synced_block_cache": SyncedBlockCache(), **self.config}
+        own_http_client = config.get("http_client") is None
+        if own_http_client:
+            config["http_client"] = httpx.Client()
+
+        page_ids = iter(page_ids)
+        pending = {}
+        try:
+            with futures.ThreadPoolExecutor(concurrency) as executor:
+                try:
+                    while True:
+                        window = 2 * concurrency - len(pending)
+                        for page_id in islice(page_ids, window):
+                            future = executor.submit(
+                                self._get_markdown_string, page_id, config
+                            )
+                            pending[future] = page_id
+                        if not pending:
+                            return
+                        done, _ = futures.wait(
+                            pending, return_when=futures.FIRST_COMPLETED
+                        )
+                        for future in done:
+                            yield pending.pop(future), future.result()
+                finally:
+                    for future in pending:
+                        future.cancel()
+        finally:
+            if own_http_client:
+                config["http_client"].close()
+
+    def export_database(
+        self, database_id: str, concurrency: int = 4
+    ) -> Iterator[Tuple[str, str]]:
+        """Convert every row page of a database, yielding (page_id, markdown)"""
+        page_ids = (
+            page["id"]
+            for page in iter_database_pages(
+                self.notion, database_id, self.config.get("rate_limiter")
+            )
+        )
+        return self.export_many(page_ids, concurrency)
+
+    async def export_many_async(
+        self, page_ids: Iterable[str], concurrency: int = 4
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """Convert pages concurrently, yielding (page_id, markdown) as they complete
+
+        Page ids are taken as pages complete, so at most concurrency pages are
+        in flight and the iterable is not drained up front.
+        """
+
+        # Pages of one export share a synced block cache and one HTTP client.
+        config = {"synced_block_cache": SyncedBlockCache(), **self.config}
+        own_http_client = config.get("http_client") is None
+        if own_http_client:
+            config["http_client"] = httpx.AsyncClient()
+
+        async def export(page_id: str) -> Tuple[str, str]:
+            return page_id, await self._get_markdown_string_async(page_id, config)
+
+        page_ids = iter(page_ids)
+        pending = set()
+        try:
+            while True:
+                for page_id in islice(page_ids, concurrency - len(pending)):
+                    pending.add(asyncio.ensure_future(export(page_id)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if own_http_client:
+                await asyncio.gather(*pending, return_exceptions=True)
+                await config["http_client"].aclose()
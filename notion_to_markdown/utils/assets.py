@@ -0,0 +1,48 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+from urllib.parse import unquote, urlsplit
+
+
+def asset_extension(url: str) -> str:
+    """Get the file extension of the URL path, if it has a short one"""
+    extension = posixpath.splitext(unquote(urlsplit(url).path))[1].lower()
+    if len(extension) > 10 or not extension[1:].isalnum():
+        return ""
+    return extension
+
+
+class AssetFile:
+    """File downloaded to an assets directory, named by the hash of its content
+
+    Files with the same content are stored once, whatever URL they came from.
+    """
+
+    def __init__(self, directory: str, url: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.extension = asset_extension(url)
+        self._hash = hashlib.sha256()
+        fd, self._temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self) -> str:
+        """Move the file to its content addressed name and return the name"""
+        self._file.close()
+        name = f"{self._hash.hexdigest()}{self.extension}"
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            os.remove(self._temporary_path)
+        else:
+            os.replace(self._temporary_path, path)
+        return name
+
+    def discard(self) -> None:
+        self._file.close()
+        if os.path.exists(self._temporary_path):
+            os.remove(self._temporary_path)
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from .lazy import LazyModule
+
+if TYPE_CHECKING:
+    import sqlite3
+else:
+    sqlite3 = LazyModule("sqlite3")
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "notion-to-markdown", "blocks.sqlite3"
+)
+
+DEFAULT_IMAGE_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "notion-to-markdown", "images"
+)
+
+
+class BlockCache:
+    """Cache of block children lists, keyed by block id and a version"""
+
+    def get(self, block_id: str, version: str) -> Optional[List[Dict]]:
+        """Get the cached children of a block if the version matches"""
+        raise NotImplementedError
+
+    def set(self, block_id: str, version: str, blocks: List[Dict]) -> None:
+        """Store the children of a block for a version"""
+        raise NotImplementedError
+
+
+class SQLiteBlockCache(BlockCache):
+    """Block cache persisted in a SQLite database with zlib compressed entries"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_size: int = 256 * 2**20):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "block_id TEXT PRIMARY KEY, version TEXT NOT NULL, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, block_id: str, version: str) -> Optional[List[Dict]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM blocks WHERE block_id = ? AND version = ?",
+                (block_id, version),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE blocks SET accessed = ? WHERE block_id = ?",
+                (time.time(), block_id),
+            )
+            self._connection.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, block_id: str, version: str, blocks: List[Dict]) -> None:
+        data = zlib.compress(json.dumps(blocks).encode())
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)",
+                (block_id, version, data, len(data), time.time()),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries until the cache fits max_size"""
+        total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blocks"
+        ).fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        rows = self._connection.execute(
+            "SELECT block_id, size FROM blocks ORDER BY accessed"
+        ).fetchall()
+        evicted = []
+        for block_id, size in rows:
+            if total_size <= self.max_size:
+                break
+            evicted.append((block_id,))
+            total_size -= size
+        self._connection.executemany("DELETE FROM blocks WHERE block_id = ?", evicted)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self._connection.close()
+
+
+class SyncedBlockCache:
+    """LRU cache of the rendered children of synced block originals
+
+    Entries are optionally persisted to a block cache, where they are reused
+    as long as they were stored under the same version. Each entry keeps the
+    earliest expiry time of the signed file URLs rendered in it, converters
+    render originals again once it passes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        store: Optional[BlockCache] = None,
+        version: str = "",
+    ):
+        self.max_entries = max_entries
+        self.store = store
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, block_id: str) -> Optional[List[Dict]]:
+        """Get the markdown blocks rendered for a synced block original"""
+        entry = self.get_entry(block_id)
+        return None if entry is None else entry[0]
+
+    def get_entry(
+        self, block_id: str
+    ) -> Optional[Tuple[List[Dict], Optional[str]]]:
+        """Get the markdown blocks rendered for a synced block original and
+        the earliest expiry time of the signed file URLs in them
+        """
+        with self._lock:
+            if block_id in self._entries:
+                self._entries.move_to_end(block_id)
+                return self._entries[block_id]
+
+        if self.store is None:
+            return None
+        stored = self.store.get(f"synced:{block_id}", self.version)
+        if stored is None:
+            return None
+        entry = (stored[0]["md_blocks"], stored[0]["expiry_time"])
+        self._remember(block_id, entry)
+        return entry
+
+    def set(
+        self,
+        block_id: str,
+        md_blocks: List[Dict],
+        expiry_time: Optional[str] = None,
+    ) -> None:
+        """Store the markdown blocks rendered for a synced block original"""
+        self._remember(block_id, (md_blocks, expiry_time))
+        if self.store is not None:
+            self.store.set(
+                f"synced:{block_id}",
+                self.version,
+                [{"md_blocks": md_blocks, "expiry_time": expiry_time}],
+            )
+
+    def _remember(
+        self, block_id: str, entry: Tuple[List[Dict], Optional[str]]
+    ) -> None:
+        with self._lock:
+            self._entries[block_id] = entry
+            self._entries.move_to_end(block_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def image_cache_key(url: str, block_id: Optional[str]) -> str:
+    """Key an image by its URL, or for a Notion hosted file by its block id
+    and URL without the signed query string
+    """
+    if block_id is None:
+        return url
+    stable_url = urlsplit(url)._replace(query="", fragment="").geturl()
+    return f"{block_id}:{stable_url}"
+
+
+class ImageCache:
+    """Disk cache of image bytes, stored once per content hash
+
+    Files hosted by Notion are keyed by their block id and URL path, so the
+    changing query string of their signed URLs does not miss the cache.
+    External images are keyed by their whole URL. The least recently
+    used contents are evicted once they exceed max_size bytes.
+    """
+
+    def __init__(
+        self, directory: str = DEFAULT_IMAGE_CACHE_DIR, max_size: int = 2**30
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS images (key TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS contents ("
+            "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def get(self, url: str, block_id: Optional[str]) -> Optional[bytes]:
+        """Get the cached bytes of an image"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest FROM images WHERE key = ?",
+                (image_cache_key(url, block_id),),
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._path(row[0]), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return None
+            self._connection.execute(
+                "UPDATE contents SET accessed = ? WHERE digest = ?",
+                (time.time(), row[0]),
+            )
+            self._connection.commit()
+        return data
+
+    def set(self, url: str, block_id: Optional[str], data: bytes) -> None:
+        """Store the bytes of an image"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if not os.path.exists(self._path(digest)):
+                temporary_path = f"{self._path(digest)}.{threading.get_ident()}.tmp"
+                with open(temporary_path, "wb") as f:
+                    f.write(data)
+                os.replace(temporary_path, self._path(digest))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?)",
+                (image_cache_key(url, block_id), digest),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO contents VALUES (?, ?, ?)",
+                (digest, len(data), time.time()),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used contents until the cache fits max_size"""
+        total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM contents"
+        ).fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        rows = self._connection.execute(
+            "SELECT digest, size FROM contents ORDER BY accessed"
+        ).fetchall()
+        for digest, size in rows:
+            if total_size <= self.max_size:
+                break
+            self._connection.execute("DELETE FROM contents WHERE digest = ?", (digest,))
+            self._connection.execute("DELETE FROM images WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def close(self) -> None:
+        """Close the index database connection"""
+        self._connection.close()
@@ -0,0 +1,26 @@
+import importlib
+from types import ModuleType
+
+
+class LazyModule:
+    """Stand-in for a module, imported on first attribute access
+
+    Keeps heavy dependencies out of ``import notion_to_markdown`` until they
+    are used. Attributes are looked up on the module every time, so patching
+    the module still takes effect.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
@@ -1,10 +1,16 @@
+from __future__ import annotations
+
 import base64
 import re
+import unicodedata
+
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Dict, List, Tuple
+from .lazy import LazyModule
 
-import httpx
-from typing import Optional, Dict, List
-from pytablewriter import MarkdownTableWriter
-from pytablewriter.style import Style
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = LazyModule("httpx")
 
 
 def inline_code(text: str) -> str:
@@ -58,8 +64,7 @@ def heading3(text: str) -> str:
 
 
 def quote(text: str) -> str:
-    no_newline = text.replace("\n", "\n> ")
-    return f"> {no_newline}"
+    return prefix_lines(text, "> ")
 
 
 def callout(text: str, icon: Optional[Dict] = None) -> str:
@@ -90,14 +95,43 @@ def _generate_image_markup(alt: str, href: str) -> str:
     return f"![{alt}]({href})"
 
 
+def image_data(alt: str, data: bytes) -> str:
+    base64_data = base64.b64encode(data).decode()
+    return f"![{alt}](data:image/png;base64,{base64_data})"
+
+
+def image_data_start(alt: str) -> str:
+    return f"![{alt}](data:image/png;base64,"
+
+
+def image_data_end(rest: bytes = b"") -> str:
+    return f"{base64.b64encode(rest).decode()})"
+
+
+def encode_base64_chunk(data: bytes) -> Tuple[str, bytes]:
+    """Encode the longest prefix of whole 3 byte groups, returning the rest"""
+    cut = len(data) - len(data) % 3
+    return base64.b64encode(data[:cut]).decode(), data[cut:]
+
+
+def image_stream(alt: str, chunks: Iterable[bytes]) -> Iterator[str]:
+    """Yield image markup, base64 encoding the data one chunk at a time"""
+    yield image_data_start(alt)
+    rest = b""
+    for chunk in chunks:
+        encoded, rest = encode_base64_chunk(rest + chunk)
+        if encoded:
+            yield encoded
+    yield image_data_end(rest)
+
+
 def image(alt: str, href: str, convert_to_base64: bool = False) -> str:
     if not convert_to_base64 or href.startswith("data:"):
         return _generate_image_markup(alt, href)
 
     with httpx.Client() as client:
         response = client.get(href)
-    base64_data = base64.b64encode(response.content).decode()
-    return f"![{alt}](data:image/png;base64,{base64_data})"
+    return image_data(alt, response.content)
 
 
 async def image_async(alt: str, href: str, convert_to_base64: bool = False) -> str:
@@ -106,32 +140,91 @@ async def image_async(alt: str, href: str, convert_to_base64: bool = False) -> s
 
     async with httpx.AsyncClient() as client:
         response = await client.get(href)
-    base64_data = base64.b64encode(response.content).decode()
-    return f"![{alt}](data:image/png;base64,{base64_data})"
+    return image_data(alt, response.content)
 
 
-def add_tab_space(text: str, n: int = 0) -> str:
-    if n <= 0:
+def prefix_lines(text: str, prefix: str) -> str:
+    """Start every line of the text with the prefix, in one pass"""
+    if not prefix:
         return text
+    return prefix + text.replace("\n", "\n" + prefix)
 
-    tab = "\t"
-    if "\n" in text:
-        lines = text.split("\n")
-        return "\n".join(f"{tab * n}{line}" for line in lines)
-    return f"{tab * n}{text}"
+
+def add_tab_space(text: str, n: int = 0) -> str:
+    return prefix_lines(text, "\t" * n) if n > 0 else text
 
 
 def divider() -> str:
     return "---"
 
 
+def toggle_tags(summary: str) -> Tuple[str, str]:
+    return f"<details><summary>{summary}</summary>", "</details>"
+
+
 def toggle(summary: Optional[str] = None, children: Optional[str] = None) -> str:
     if not summary:
         return children or ""
-    return f"<details><summary>{summary}</summary>{children or ''}</details>"
+    start, end = toggle_tags(summary)
+    return f"{start}{children or ''}{end}"
+
 
+def _table_cell(text: str) -> str:
+    return text.replace("\n", " ").replace("|", "\\|")
+
+
+def _text_width(text: str) -> int:
+    """Get the display width of text, counting wide characters twice"""
+    if text.isascii():
+        return len(text)
+    return sum(
+        2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text
+    )
+
+
+def table(cells: List[List[str]], use_pytablewriter: bool = False) -> str:
+    """Render rows of cells as a GFM table, the first row being the header
+
+    Columns are padded to their widest cell, headers are centered and cells
+    are left aligned.
+    """
+    if use_pytablewriter:
+        return _pytablewriter_table(cells)
+    if not cells:
+        return ""
+
+    columns = max(len(row) for row in cells)
+    rows = [
+        [_table_cell(cell) for cell in row] + [""] * (columns - len(row))
+        for row in cells
+    ]
+    cell_widths = [[_text_width(cell) for cell in row] for row in rows]
+    widths = [
+        max(3, *(row[column] for row in cell_widths)) for column in range(columns)
+    ]
+
+    header = []
+    for cell, cell_width, width in zip(rows[0], cell_widths[0], widths):
+        left = (width - cell_width) // 2
+        header.append(" " * left + cell + " " * (width - cell_width - left))
+    lines = [
+        f"| {' | '.join(header)} |",
+        f"| {' | '.join('-' * width for width in widths)} |",
+    ]
+    for row, row_widths in zip(rows[1:], cell_widths[1:]):
+        padded = [
+            cell + " " * (width - cell_width)
+            for cell, cell_width, width in zip(row, row_widths, widths)
+        ]
+        lines.append(f"| {' | '.join(padded)} |")
+    return "\n".join(lines)
+
+
+def _pytablewriter_table(cells: List[List[str]]) -> str:
+    """Render a table with pytablewriter, installed with the pytablewriter extra"""
+    from pytablewriter import MarkdownTableWriter
+    from pytablewriter.style import Style
 
-def table(cells: List[List[str]]) -> str:
     return (
         MarkdownTableWriter(
             headers=cells[0],
@@ -142,3 +235,5 @@ def table(cells: List[List[str]]) -> str:
         .dumps()
         .strip("\n")
     )
+
+
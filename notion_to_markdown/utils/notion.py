@@ -1,31 +1,501 @@
-from typing import List, Optional, Dict
-from notion_client import Client, AsyncClient
+from __future__ import annotations
 
+import threading
+import time
+from datetime import datetime
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Dict,
+    Union,
+)
+from .cache import BlockCache
+from .lazy import LazyModule
 
-def get_block_children(
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent import futures
+    from notion_client import Client, AsyncClient
+    from notion_client import errors
+else:
+    asyncio = LazyModule("asyncio")
+    futures = LazyModule("concurrent.futures")
+    errors = LazyModule("notion_client.errors")
+
+# Signed file URLs of cached blocks are refreshed this many seconds before
+# they expire.
+URL_EXPIRY_MARGIN = 300
+
+
+class RateLimiter:
+    """Token bucket pacing Notion API requests across threads and event loops"""
+
+    def __init__(
+        self,
+        rate: Optional[float] = 3.0,
+        capacity: int = 10,
+        max_retries: int = 5,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._blocked_until - now)
+            if self.rate:
+                # Tokens go negative while requests are queued up, so every
+                # caller gets its own slot without holding the lock to wait.
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    delay = max(delay, -self._tokens / self.rate)
+            return delay
+
+    def acquire(self) -> None:
+        """Wait for a request slot"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Wait for a request slot without blocking the event loop"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def retry_delay(
+        self, error: errors.HTTPResponseError, attempt: int
+    ) -> Optional[float]:
+        """Get the delay before retrying a rate limited request, None to give up"""
+        if error.status != 429 or attempt >= self.max_retries:
+            return None
+
+        try:
+            delay = float(error.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            delay = float(2**attempt)
+
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+
+shared_rate_limiter = RateLimiter()
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Call func, or wait for the result of the call in flight for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = futures.Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """Share one in-flight call between concurrent tasks with the same key"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await func, or the result of the call in flight for key
+
+        The call runs in its own task, so cancelling one caller leaves it
+        running for the others.
+        """
+        loop = asyncio.get_running_loop()
+        key = (id(loop), key)
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = loop.create_task(func())
+            task.add_done_callback(lambda task: self._finish(key, task))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        del self._calls[key]
+        # Retrieve the error, nobody may be left waiting for it.
+        if not task.cancelled():
+            task.exception()
+
+
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
+
+
+class LazyChildren:
+    """Children of a block, fetched the first time they are requested"""
+
+    def __init__(self, fetch: Callable[[], List[Dict]]):
+        self._fetch = fetch
+        self._children = None
+        self._lock = threading.Lock()
+
+    def get(self) -> List[Dict]:
+        """Get the children, fetching them on the first call"""
+        with self._lock:
+            if self._children is None:
+                self._children = self._fetch()
+        return self._children
+
+
+class AsyncLazyChildren:
+    """Children of a block, fetched the first time they are awaited"""
+
+    def __init__(self, fetch: Callable[[], Awaitable[List[Dict]]]):
+        self._fetch = fetch
+        self._task = None
+
+    async def get(self) -> List[Dict]:
+        """Get the children, fetching them on the first call"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._fetch())
+        return await self._task
+
+
+def request_with_retry(
+    request: Callable[[], Any], rate_limiter: Optional[RateLimiter] = None
+) -> Any:
+    """Make a paced Notion request, retrying it when rate limited"""
+    rate_limiter = rate_limiter or shared_rate_limiter
+    attempt = 0
+
+    while True:
+        rate_limiter.acquire()
+        try:
+            return request()
+        except errors.HTTPResponseError as error:
+            if rate_limiter.retry_delay(error, attempt) is None:
+                raise
+            attempt += 1
+
+
+async def request_with_retry_async(
+    request: Callable[[], Awaitable[Any]], rate_limiter: Optional[RateLimiter] = None
+) -> Any:
+    """Make a paced Notion request, retrying it when rate limited"""
+    rate_limiter = rate_limiter or shared_rate_limiter
+    attempt = 0
+
+    while True:
+        await rate_limiter.acquire_async()
+        try:
+            return await request()
+        except errors.HTTPResponseError as error:
+            if rate_limiter.retry_delay(error, attempt) is None:
+                raise
+            attempt += 1
+
+
+def list_block_children(
     notion_client: Client,
     block_id: str,
-    total_pages: Optional[int] = None,
-) -> List[Dict]:
-    """Get all children blocks of a Notion block"""
-    result = []
-    page_count = 0
-    start_cursor = None
+    start_cursor: Optional[str] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Dict:
+    """List one page of children of a Notion block, retrying when rate limited
 
-    while True:
-        response = notion_client.blocks.children.list(
+    Concurrent requests for the same page of the same block share one call.
+    """
+    rate_limiter = rate_limiter or shared_rate_limiter
+    return single_flight.do(
+        (id(notion_client), block_id, start_cursor),
+        lambda: _list_block_children(
+            notion_client, block_id, start_cursor, rate_limiter
+        ),
+    )
+
+
+def _list_block_children(
+    notion_client: Client,
+    block_id: str,
+    start_cursor: Optional[str],
+    rate_limiter: RateLimiter,
+) -> Dict:
+    return request_with_retry(
+        lambda: notion_client.blocks.children.list(
+            start_cursor=start_cursor, block_id=block_id
+        ),
+        rate_limiter,
+    )
+
+
+async def list_block_children_async(
+    notion_client: AsyncClient,
+    block_id: str,
+    start_cursor: Optional[str] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Dict:
+    """List one page of children of a Notion block, retrying when rate limited
+
+    Concurrent requests for the same page of the same block share one call.
+    """
+    rate_limiter = rate_limiter or shared_rate_limiter
+    return await async_single_flight.do(
+        (id(notion_client), block_id, start_cursor),
+        lambda: _list_block_children_async(
+            notion_client, block_id, start_cursor, rate_limiter
+        ),
+    )
+
+
+async def _list_block_children_async(
+    notion_client: AsyncClient,
+    block_id: str,
+    start_cursor: Optional[str],
+    rate_limiter: RateLimiter,
+) -> Dict:
+    return await request_with_retry_async(
+        lambda: notion_client.blocks.children.list(
             start_cursor=start_cursor, block_id=block_id
+        ),
+        rate_limiter,
+    )
+
+
+def iter_block_children(
+    notion_client: Client,
+    block_id: str,
+    total_pages: Optional[int] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    prefetch: bool = True,
+) -> Iterator[Dict]:
+    """Yield children blocks of a Notion block as each page of them arrives
+
+    With prefetch, the next page is requested on a background thread while
+    the blocks of the current one are consumed.
+    """
+    executor = None
+    pending = None
+    try:
+        response = list_block_children(notion_client, block_id, None, rate_limiter)
+        page_count = 1
+        numbered_list_index = 0
+
+        while True:
+            start_cursor = response.get("next_cursor")
+            has_next = start_cursor and not (total_pages and page_count >= total_pages)
+            if has_next and prefetch:
+                executor = executor or futures.ThreadPoolExecutor(1)
+                pending = executor.submit(
+                    list_block_children,
+                    notion_client,
+                    block_id,
+                    start_cursor,
+                    rate_limiter,
+                )
+
+            numbered_list_index = modify_numbered_list_object(
+                response["results"], numbered_list_index
+            )
+            yield from response["results"]
+
+            if not has_next:
+                return
+            if pending is not None:
+                response, pending = pending.result(), None
+            else:
+                response = list_block_children(
+                    notion_client, block_id, start_cursor, rate_limiter
+                )
+            page_count += 1
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+async def aiter_block_children(
+    notion_client: AsyncClient,
+    block_id: str,
+    total_pages: Optional[int] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    prefetch: bool = True,
+) -> AsyncIterator[Dict]:
+    """Yield children blocks of a Notion block as each page of them arrives
+
+    With prefetch, the next page is requested in a task while the blocks of
+    the current one are consumed.
+    """
+    pending = None
+    try:
+        response = await list_block_children_async(
+            notion_client, block_id, None, rate_limiter
         )
+        page_count = 1
+        numbered_list_index = 0
+
+        while True:
+            start_cursor = response.get("next_cursor")
+            has_next = start_cursor and not (total_pages and page_count >= total_pages)
+            if has_next and prefetch:
+                pending = asyncio.ensure_future(
+                    list_block_children_async(
+                        notion_client, block_id, start_cursor, rate_limiter
+                    )
+                )
+
+            numbered_list_index = modify_numbered_list_object(
+                response["results"], numbered_list_index
+            )
+            for block in response["results"]:
+                yield block
+
+            if not has_next:
+                return
+            if pending is not None:
+                response, pending = await pending, None
+            else:
+                response = await list_block_children_async(
+                    notion_client, block_id, start_cursor, rate_limiter
+                )
+            page_count += 1
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def _file_expiry_times(block: Dict) -> Iterator[str]:
+    """Yield the expiry times of the signed file URLs in a block"""
+    content = block.get(block.get("type"))
+    if not isinstance(content, dict):
+        return
+    for item in [content, content.get("icon")]:
+        if isinstance(item, dict) and item.get("type") == "file":
+            expiry_time = item["file"].get("expiry_time")
+            if expiry_time:
+                yield expiry_time
+
+
+def _expiry_timestamp(expiry_time: str) -> float:
+    return datetime.fromisoformat(expiry_time.replace("Z", "+00:00")).timestamp()
+
+
+def earliest_expiry_time(expiry_times: Iterable[Optional[str]]) -> Optional[str]:
+    """Get the earliest of some expiry times, None when there are none"""
+    return min(filter(None, expiry_times), key=_expiry_timestamp, default=None)
+
+
+def block_expiry_time(block: Dict) -> Optional[str]:
+    """Get the earliest expiry time of the signed file URLs in a block"""
+    return earliest_expiry_time(_file_expiry_times(block))
+
+
+def expires_within(
+    expiry_time: Optional[str], margin: float = URL_EXPIRY_MARGIN
+) -> bool:
+    """Check whether an expiry time has passed or is within margin"""
+    return (
+        expiry_time is not None
+        and _expiry_timestamp(expiry_time) <= time.time() + margin
+    )
 
-        result.extend(response["results"])
 
-        start_cursor = response.get("next_cursor")
-        page_count += 1
+def stale_file_blocks(
+    blocks: List[Dict], margin: float = URL_EXPIRY_MARGIN
+) -> List[int]:
+    """Get the indexes of blocks with signed file URLs expiring within margin"""
+    return [
+        index
+        for index, block in enumerate(blocks)
+        if expires_within(block_expiry_time(block), margin)
+    ]
 
-        if not start_cursor or (total_pages and page_count >= total_pages):
-            break
 
-    modify_numbered_list_object(result)
+def retrieve_block(
+    notion_client: Client, block_id: str, rate_limiter: Optional[RateLimiter] = None
+) -> Dict:
+    """Retrieve a Notion block, retrying when rate limited"""
+    return request_with_retry(
+        lambda: notion_client.blocks.retrieve(block_id=block_id), rate_limiter
+    )
+
+
+async def retrieve_block_async(
+    notion_client: AsyncClient,
+    block_id: str,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Dict:
+    """Retrieve a Notion block, retrying when rate limited"""
+    return await request_with_retry_async(
+        lambda: notion_client.blocks.retrieve(block_id=block_id), rate_limiter
+    )
+
+
+def get_block_children(
+    notion_client: Client,
+    block_id: str,
+    total_pages: Optional[int] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    cache: Optional[BlockCache] = None,
+    version: Optional[str] = None,
+) -> List[Dict]:
+    """Get all children blocks of a Notion block
+
+    Full children lists are cached when both a cache and the version of the
+    block, usually its last_edited_time, are given. Cached blocks with signed
+    file URLs about to expire are retrieved again, one block at a time.
+    """
+    use_cache = cache is not None and version is not None and not total_pages
+    if use_cache:
+        cached = cache.get(block_id, version)
+        if cached is not None:
+            stale = stale_file_blocks(cached)
+            for index in stale:
+                cached[index] = retrieve_block(
+                    notion_client, cached[index]["id"], rate_limiter
+                )
+            if stale:
+                cache.set(block_id, version, cached)
+            return cached
+
+    result = list(
+        iter_block_children(
+            notion_client, block_id, total_pages, rate_limiter, prefetch=False
+        )
+    )
+
+    if use_cache:
+        cache.set(block_id, version, result)
     return result
 
 
@@ -33,36 +503,123 @@ async def get_block_children_async(
     notion_client: AsyncClient,
     block_id: str,
     total_pages: Optional[int] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    cache: Optional[BlockCache] = None,
+    version: Optional[str] = None,
 ) -> List[Dict]:
-    """Get all children blocks of a Notion block"""
-    result = []
-    page_count = 0
-    start_cursor = None
+    """Get all children blocks of a Notion block
 
-    while True:
-        response = await notion_client.blocks.children.list(
-            start_cursor=start_cursor, block_id=block_id
+    Full children lists are cached when both a cache and the version of the
+    block, usually its last_edited_time, are given. Cached blocks with signed
+    file URLs about to expire are retrieved again, concurrently.
+    """
+    use_cache = cache is not None and version is not None and not total_pages
+    if use_cache:
+        cached = cache.get(block_id, version)
+        if cached is not None:
+            stale = stale_file_blocks(cached)
+            refreshed = await asyncio.gather(
+                *(
+                    retrieve_block_async(
+                        notion_client, cached[index]["id"], rate_limiter
+                    )
+                    for index in stale
+                )
+            )
+            for index, block in zip(stale, refreshed):
+                cached[index] = block
+            if stale:
+                cache.set(block_id, version, cached)
+            return cached
+
+    result = [
+        block
+        async for block in aiter_block_children(
+            notion_client, block_id, total_pages, rate_limiter, prefetch=False
         )
+    ]
+
+    if use_cache:
+        cache.set(block_id, version, result)
+    return result
 
-        result.extend(response["results"])
 
-        start_cursor = response.get("next_cursor")
-        page_count += 1
+def _database_queries(
+    notion_client: Union[Client, AsyncClient], database: Dict
+) -> List[Callable[..., Any]]:
+    """Get the query endpoints listing the rows of a database"""
+    if "data_sources" in database:
+        return [
+            partial(notion_client.data_sources.query, data_source_id=data_source["id"])
+            for data_source in database["data_sources"]
+        ]
+    # Databases retrieved with API versions before data sources are queried directly.
+    return [partial(notion_client.databases.query, database_id=database["id"])]
 
-        if not start_cursor or (total_pages and page_count >= total_pages):
-            break
 
-    modify_numbered_list_object(result)
-    return result
+def iter_database_pages(
+    notion_client: Client,
+    database_id: str,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Iterator[Dict]:
+    """Yield the row pages of a Notion database"""
+    database = request_with_retry(
+        lambda: notion_client.databases.retrieve(database_id=database_id),
+        rate_limiter,
+    )
+
+    for query in _database_queries(notion_client, database):
+        start_cursor = None
+        while True:
+            response = request_with_retry(
+                lambda: query(start_cursor=start_cursor), rate_limiter
+            )
+            for row in response["results"]:
+                if row.get("object") == "page":
+                    yield row
 
+            start_cursor = response.get("next_cursor")
+            if not start_cursor:
+                break
 
-def modify_numbered_list_object(blocks: List[Dict]) -> None:
-    """Modify numbered list items to include their numbers"""
-    numbered_list_index = 0
 
+async def aiter_database_pages(
+    notion_client: AsyncClient,
+    database_id: str,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> AsyncIterator[Dict]:
+    """Yield the row pages of a Notion database"""
+    database = await request_with_retry_async(
+        lambda: notion_client.databases.retrieve(database_id=database_id),
+        rate_limiter,
+    )
+
+    for query in _database_queries(notion_client, database):
+        start_cursor = None
+        while True:
+            response = await request_with_retry_async(
+                lambda: query(start_cursor=start_cursor), rate_limiter
+            )
+            for row in response["results"]:
+                if row.get("object") == "page":
+                    yield row
+
+            start_cursor = response.get("next_cursor")
+            if not start_cursor:
+                break
+
+
+def modify_numbered_list_object(blocks: List[Dict], numbered_list_index: int = 0) -> int:
+    """Modify numbered list items to include their numbers
+
+    Numbering continues from ``numbered_list_index``, the number of the list
+    item preceding the blocks, and the number of the last block is returned.
+    """
     for block in blocks:
         if block.get("type") == "numbered_list_item":
             numbered_list_index += 1
             block["numbered_list_item"]["number"] = numbered_list_index
         else:
             numbered_list_index = 0
+
+    return numbered_list_index
@@ -7,13 +7,15 @@ setup(
     packages=find_packages(),
     install_requires=[
         "httpx",
-        "pytablewriter",
         "notion-client",
     ],
     extras_require={
         "async": [
             "asyncio",
-        ]
+        ],
+        "pytablewriter": [
+            "pytablewriter",
+        ],
     },
     description="A package to convert Notion content into Markdown format",
     long_description=open("README.md").read(),
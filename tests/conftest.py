@@ -0,0 +1,8 @@
+import pytest
+from notion_to_markdown.utils import notion
+
+
+@pytest.fixture(autouse=True)
+def unpaced_rate_limiter(monkeypatch):
+    """Mocked clients do not need to be paced like the Notion API"""
+    monkeypatch.setattr(notion, "shared_rate_limiter", notion.RateLimiter(rate=None))
@@ -1,6 +1,16 @@
+import asyncio
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+import httpx
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
 from notion_to_markdown import NotionToMarkdown, NotionToMarkdownAsync
+from notion_to_markdown.utils import md
+from notion_to_markdown.utils.cache import ImageCache, SQLiteBlockCache, SyncedBlockCache
 
 
 def test_block_to_markdown_calls_custom_transformer():
@@ -422,30 +432,37 @@ async def test_async_child_page_configs():
 def test_nested_parent_key_logic():
     mock_client = MagicMock()
     n2m = NotionToMarkdown(notion_client=mock_client)
+    n2m.config = {"separate_child_page": True, "parse_child_pages": True}
 
-    original_to_markdown = n2m.to_markdown_string
+    input_blocks = [{
+        "type": "child_page",
+        "parent": "Child Page",
+        "children": [
+            {
+                "type": "paragraph",
+                "parent": "Para",
+                "children": [{
+                    "type": "child_page",
+                    "parent": "parent",
+                    "children": [{"type": "paragraph", "parent": "Nested Parent Content"}],
+                }]
+            }
+        ]
+    }]
 
-    def side_effect(md_blocks=None, page_identifier="parent", nesting_level=0):
-        if page_identifier == "Child Page" and nesting_level > 0:
-            return {"parent": "Nested Parent Content"}
-        return original_to_markdown(md_blocks, page_identifier, nesting_level)
+    result = n2m.to_markdown_string(input_blocks)
+    assert "Nested Parent Content" in result.get("Child Page", "")
 
-    with patch.object(n2m, 'to_markdown_string', side_effect=side_effect):
-        input_blocks = [{
-            "type": "child_page",
-            "parent": "Child Page",
-            "children": [
-                {
-                    "type": "paragraph",
-                    "parent": "Para",
-                    "children": [{"type": "paragraph"}]
-                }
-            ]
-        }]
 
-        n2m.config = {"separate_child_page": False, "parse_child_pages": True}
-        result = n2m.to_markdown_string(input_blocks)
-        assert "Nested Parent Content" in result.get("parent", "")
+def test_to_markdown_string_deeply_nested_blocks():
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+    md_blocks = []
+    for level in reversed(range(50)):
+        md_blocks = [{"type": "bulleted_list_item", "parent": f"- {level}", "children": md_blocks}]
+
+    result = n2m.to_markdown_string(md_blocks)["parent"]
+
+    assert result == "".join("\t" * level + f"- {level}\n" for level in range(50))
 
 
 @pytest.mark.asyncio
@@ -520,6 +537,47 @@ async def test_text_annotations_async():
     assert "**" in md and "_" in md
 
 
+def test_rich_text_keeps_whitespace_outside_annotations():
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+    default = {"bold": False, "italic": False, "code": False, "color": "default"}
+
+    md_text = n2m.block_to_markdown({
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [
+                {"plain_text": " plain ** ", "annotations": default},
+                {"plain_text": "\u00a0bold ", "annotations": {**default, "bold": True}},
+                {"plain_text": "  ", "annotations": {**default, "code": True}},
+                {"plain_text": "code", "annotations": {**default, "code": True, "italic": True}},
+            ]
+        }
+    })
+
+    assert md_text == " plain ** \u00a0**bold**   _`code`_"
+
+
+def test_adjacent_rich_text_spans_with_same_markup_are_merged():
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+    bold = {"bold": True, "color": "default"}
+    rich_text = [
+        {"plain_text": "Hel", "annotations": bold},
+        {"plain_text": "lo ", "annotations": {**bold, "color": "red"}},
+        {"plain_text": "world", "annotations": bold},
+        {"plain_text": "link", "annotations": bold, "href": "https://a.com"},
+        {"plain_text": "ed", "annotations": bold, "href": "https://a.com"},
+        {"type": "equation", "equation": {"expression": "x"}},
+        {"plain_text": "a", "annotations": {}},
+        {"plain_text": "b"},
+    ]
+
+    md_text = n2m.block_to_markdown(
+        {"type": "paragraph", "paragraph": {"rich_text": rich_text}}
+    )
+
+    assert md_text == "**Hello world**[**linked**](https://a.com)$x$ab"
+    assert rich_text[0]["plain_text"] == "Hel"
+
+
 @pytest.mark.asyncio
 async def test_inline_equation_async():
     n2m = NotionToMarkdownAsync(notion_client={})
@@ -1185,3 +1243,1295 @@ def test_whitespace_only_annotation():
         }
     })
     assert md == "   "
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_fetch_keeps_document_order():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def mock_list(block_id, start_cursor=None, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {
+            "results": [
+                {
+                    "type": "paragraph",
+                    "id": f"{block_id}_child",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": f"{block_id} content"}]},
+                }
+            ],
+            "next_cursor": None,
+        }
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = mock_list
+
+    n2m = NotionToMarkdownAsync(notion_client=mock_client, config={"max_concurrency": 3})
+    blocks = [
+        {
+            "id": f"toggle{i}",
+            "type": "toggle",
+            "has_children": True,
+            "toggle": {"rich_text": [{"plain_text": f"Toggle {i}"}]},
+        }
+        for i in range(6)
+    ]
+
+    md_blocks = await n2m.block_list_to_markdown(blocks)
+
+    assert [block["block_id"] for block in md_blocks] == [f"toggle{i}" for i in range(6)]
+    assert [block["children"][0]["parent"] for block in md_blocks] == [
+        f"toggle{i} content" for i in range(6)
+    ]
+    assert max_in_flight == 3
+
+
+def test_sync_executor_fetch_keeps_document_order():
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return {
+            "results": [
+                {
+                    "type": "paragraph",
+                    "id": f"{block_id}_child",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": f"{block_id} content"}]},
+                }
+            ],
+            "next_cursor": None,
+        }
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = mock_list
+
+    n2m = NotionToMarkdown(notion_client=mock_client, config={"max_concurrency": 3})
+    blocks = [
+        {
+            "id": f"toggle{i}",
+            "type": "toggle",
+            "has_children": True,
+            "toggle": {"rich_text": [{"plain_text": f"Toggle {i}"}]},
+        }
+        for i in range(6)
+    ]
+
+    md_blocks = n2m.block_list_to_markdown(blocks)
+
+    assert [block["block_id"] for block in md_blocks] == [f"toggle{i}" for i in range(6)]
+    assert [block["children"][0]["parent"] for block in md_blocks] == [
+        f"toggle{i} content" for i in range(6)
+    ]
+    assert mock_client.blocks.children.list.call_count == 6
+    assert max_in_flight == 3
+
+
+def test_sync_custom_executor_is_used():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {"results": [], "next_cursor": None}
+    executor = MagicMock()
+    executor.map.side_effect = lambda func, items: map(func, items)
+
+    n2m = NotionToMarkdown(notion_client=mock_client, config={"executor": executor})
+    n2m.block_list_to_markdown(
+        [{"id": "toggle", "type": "toggle", "has_children": True, "toggle": {}}]
+    )
+
+    executor.map.assert_called_once()
+    executor.shutdown.assert_not_called()
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+def test_page_to_markdown_reuses_unchanged_subtrees_from_manifest():
+    mock_client = MagicMock()
+
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        if block_id == "page_id":
+            results = [
+                {
+                    "id": f"toggle{i}",
+                    "type": "toggle",
+                    "has_children": True,
+                    "last_edited_time": edited_times[i],
+                    "toggle": {"rich_text": [{"plain_text": f"Toggle {i}"}]},
+                }
+                for i in range(2)
+            ]
+        else:
+            results = [
+                {
+                    "id": f"{block_id}_child",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": f"{block_id} content"}]},
+                }
+            ]
+        return {"results": results, "next_cursor": None}
+
+    mock_client.blocks.children.list.side_effect = mock_list
+    edited_times = ["2024-01-01T00:00:00.000Z", "2024-01-01T00:00:00.000Z"]
+
+    n2m = NotionToMarkdown(notion_client=mock_client)
+    first_blocks = n2m.page_to_markdown("page_id")
+    manifest = json.loads(json.dumps(n2m.manifest))
+    assert set(manifest) == {"toggle0", "toggle1"}
+    assert mock_client.blocks.children.list.call_count == 3
+
+    edited_times[1] = "2024-02-01T00:00:00.000Z"
+    mock_client.blocks.children.list.reset_mock()
+    second_blocks = n2m.page_to_markdown("page_id", manifest=manifest)
+
+    assert second_blocks == first_blocks
+    fetched = [call.kwargs["block_id"] for call in mock_client.blocks.children.list.call_args_list]
+    assert fetched == ["page_id", "toggle1"]
+    assert n2m.manifest["toggle1"]["last_edited_time"] == "2024-02-01T00:00:00.000Z"
+    assert n2m.manifest["toggle0"] == manifest["toggle0"]
+
+
+def test_manifest_stores_each_block_once():
+    depth = 200
+    mock_client = deeply_nested_client(MagicMock(), depth)
+    list_blocks = mock_client.blocks.children.list.side_effect
+
+    def mock_list(block_id, **kwargs):
+        if block_id == "page_id":
+            block_id = "item-0"
+        response = list_blocks(block_id, **kwargs)
+        for block in response["results"]:
+            block["last_edited_time"] = "2024-01-01T00:00:00.000Z"
+        return response
+
+    mock_client.blocks.children.list.side_effect = mock_list
+    n2m = NotionToMarkdown(notion_client=mock_client)
+    first_blocks = n2m.page_to_markdown("page_id")
+    manifest = json.loads(json.dumps(n2m.manifest))
+
+    assert len(manifest) == depth - 1
+    assert len(json.dumps(manifest)) < 200 * depth
+    mock_client.blocks.children.list.reset_mock()
+    assert n2m.page_to_markdown("page_id", manifest=manifest) == first_blocks
+    assert mock_client.blocks.children.list.call_count == 1
+    assert n2m.manifest == manifest
+
+@pytest.mark.parametrize(
+    "expiry_time, listed",
+    [("2999-01-01T00:00:00.000Z", ["page_id"]), ("2020-01-01T00:00:00.000Z", ["page_id", "toggle"])],
+)
+def test_manifest_entries_with_expired_file_urls_are_converted_again(expiry_time, listed):
+    def mock_list(block_id, **kwargs):
+        if block_id == "page_id":
+            results = [
+                {
+                    "id": "toggle",
+                    "type": "toggle",
+                    "has_children": True,
+                    "last_edited_time": "2024-01-01T00:00:00.000Z",
+                    "toggle": {"rich_text": [{"plain_text": "Toggle"}]},
+                }
+            ]
+        else:
+            image = image_block("image", "https://s3.example.com/a.png")
+            image["image"]["file"]["expiry_time"] = expiry_time
+            results = [image]
+        return {"results": results, "next_cursor": None}
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = mock_list
+    n2m = NotionToMarkdown(notion_client=mock_client)
+    n2m.page_to_markdown("page_id")
+    manifest = json.loads(json.dumps(n2m.manifest))
+    assert manifest["toggle"]["expiry_time"] == expiry_time
+
+    mock_client.blocks.children.list.reset_mock()
+    n2m.page_to_markdown("page_id", manifest=manifest)
+
+    fetched = [call.kwargs["block_id"] for call in mock_client.blocks.children.list.call_args_list]
+    assert fetched == listed
+
+def test_iter_markdown_does_not_record_manifest():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = lambda block_id, **kwargs: {
+        "results": [
+            {
+                "id": "toggle",
+                "type": "toggle",
+                "has_children": True,
+                "last_edited_time": "2024-01-01T00:00:00.000Z",
+                "toggle": {"rich_text": [{"plain_text": "Toggle"}]},
+            }
+            if block_id == "page_id"
+            else {
+                "id": "paragraph",
+                "type": "paragraph",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": "Content"}]},
+            }
+        ],
+        "next_cursor": None,
+    }
+
+    n2m = NotionToMarkdown(notion_client=mock_client)
+    n2m.page_to_markdown("page_id")
+    manifest = n2m.manifest
+    spawned = []
+    spawn = n2m._spawn
+    with patch.object(n2m, "_spawn", side_effect=lambda: spawned.append(spawn()) or spawned[-1]):
+        chunks = list(n2m.iter_markdown("page_id"))
+
+    assert "Content" in "".join(chunks)
+    assert spawned[0].manifest is None
+    assert n2m.manifest is manifest
+
+
+@pytest.mark.asyncio
+async def test_async_page_to_markdown_reuses_unchanged_subtrees_from_manifest():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            {
+                "id": "toggle",
+                "type": "toggle",
+                "has_children": True,
+                "last_edited_time": "2024-01-01T00:00:00.000Z",
+                "toggle": {"rich_text": []},
+            }
+        ],
+        "next_cursor": None,
+    }
+    manifest = {
+        "toggle": {
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "md_block": {
+                "type": "toggle",
+                "block_id": "toggle",
+                "parent": "",
+                "children": [
+                    {"type": "paragraph", "block_id": "p", "parent": "Old", "children": []}
+                ],
+            },
+        }
+    }
+
+    n2m = NotionToMarkdownAsync(notion_client=mock_client)
+    md_blocks = await n2m.page_to_markdown("page_id", manifest=manifest)
+
+    assert md_blocks == [manifest["toggle"]["md_block"]]
+    assert mock_client.blocks.children.list.call_count == 1
+    assert n2m.manifest == manifest
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_synced_block_original_fetched_once(max_concurrency):
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            {
+                "type": "paragraph",
+                "id": "para",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": "Synced footer"}]},
+            }
+        ],
+        "next_cursor": None,
+    }
+    synced_block_cache = SyncedBlockCache()
+    blocks = [
+        {
+            "id": "synced_copy",
+            "type": "synced_block",
+            "has_children": True,
+            "synced_block": {"synced_from": {"block_id": "original_id"}},
+        }
+    ]
+
+    for _ in range(3):
+        n2m = NotionToMarkdown(
+            notion_client=mock_client,
+            config={
+                "synced_block_cache": synced_block_cache,
+                "max_concurrency": max_concurrency,
+            },
+        )
+        md_blocks = n2m.block_list_to_markdown(blocks)
+        assert md_blocks[0]["children"][0]["parent"] == "Synced footer"
+
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_async_synced_block_original_fetched_once():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            {
+                "type": "paragraph",
+                "id": "para",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": "Synced footer"}]},
+            }
+        ],
+        "next_cursor": None,
+    }
+    n2m = NotionToMarkdownAsync(notion_client=mock_client)
+    blocks = [
+        {
+            "id": f"synced_copy{i}",
+            "type": "synced_block",
+            "has_children": True,
+            "synced_block": {"synced_from": {"block_id": "original_id"}},
+        }
+        for i in range(3)
+    ]
+
+    md_blocks = await n2m.block_list_to_markdown(blocks)
+
+    assert [block["children"][0]["parent"] for block in md_blocks] == ["Synced footer"] * 3
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+def synced_copies_client(client, footer):
+    """A page of copies of a synced original holding a nested toggle
+
+    The second page of copies arrives after the original was listed and
+    while its toggle is still being converted.
+    """
+
+    async def mock_list(block_id, start_cursor=None, **kwargs):
+        if block_id == "page_id":
+            await asyncio.sleep(0.015 if start_cursor else 0)
+            results = [
+                {
+                    "id": f"synced_copy{i}",
+                    "type": "synced_block",
+                    "has_children": True,
+                    "synced_block": {"synced_from": {"block_id": "original_id"}},
+                }
+                for i in ([1, 2] if start_cursor else [0])
+            ]
+            return {"results": results, "next_cursor": None if start_cursor else "next"}
+
+        await asyncio.sleep(0.01)
+        if block_id == "original_id":
+            results = [
+                {
+                    "id": "toggle",
+                    "type": "toggle",
+                    "has_children": True,
+                    "toggle": {"rich_text": [{"plain_text": "Toggle"}]},
+                }
+            ]
+        else:
+            results = [
+                {
+                    "id": "para",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": footer[0]}]},
+                }
+            ]
+        return {"results": results, "next_cursor": None}
+
+    client.blocks.children.list.side_effect = mock_list
+    return client
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_synced_copies_convert_original_once():
+    mock_client = synced_copies_client(MagicMock(), ["Synced footer"])
+    n2m = NotionToMarkdownAsync(
+        notion_client=mock_client, config={"max_concurrency": 4}
+    )
+
+    md_blocks = await n2m.page_to_markdown("page_id")
+
+    assert all("Synced footer" in n2m.to_markdown_string([block])["parent"] for block in md_blocks)
+    fetched = [call.kwargs["block_id"] for call in mock_client.blocks.children.list.call_args_list]
+    assert fetched.count("original_id") == 1
+    assert fetched.count("toggle") == 1
+
+
+@pytest.mark.asyncio
+async def test_async_reused_converter_renders_edited_synced_originals():
+    footer = ["version 1"]
+    n2m = NotionToMarkdownAsync(
+        notion_client=synced_copies_client(MagicMock(), footer),
+        config={"max_concurrency": 4},
+    )
+
+    first = n2m.to_markdown_string(await n2m.page_to_markdown("page_id"))["parent"]
+    footer[0] = "version 2"
+    second = n2m.to_markdown_string(await n2m.page_to_markdown("page_id"))["parent"]
+
+    assert "version 1" in first
+    assert "version 2" in second and "version 1" not in second
+
+def test_persisted_synced_blocks_with_expired_file_urls_are_converted_again():
+    def mock_list(block_id, **kwargs):
+        if block_id == "page_id":
+            results = [
+                {
+                    "id": "synced_copy",
+                    "type": "synced_block",
+                    "has_children": True,
+                    "synced_block": {"synced_from": {"block_id": "original_id"}},
+                }
+            ]
+        else:
+            image = image_block("image", "https://s3.example.com/a.png")
+            image["image"]["file"]["expiry_time"] = "2020-01-01T00:00:00.000Z"
+            results = [image]
+        return {"results": results, "next_cursor": None}
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = mock_list
+    store = SQLiteBlockCache(":memory:")
+
+    for _ in range(2):
+        n2m = NotionToMarkdown(
+            notion_client=mock_client,
+            config={"synced_block_cache": SyncedBlockCache(store=store)},
+        )
+        n2m.page_to_markdown("page_id")
+
+    fetched = [call.kwargs["block_id"] for call in mock_client.blocks.children.list.call_args_list]
+    assert fetched.count("original_id") == 2
+    assert store.get("synced:original_id", "")[0]["expiry_time"] == "2020-01-01T00:00:00.000Z"
+
+def table_and_callout_client(client):
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        if block_id == "table_id":
+            results = [
+                {
+                    "id": f"row{i}",
+                    "type": "table_row",
+                    "has_children": False,
+                    "table_row": {"cells": [[{"plain_text": f"Cell {i}"}]]},
+                }
+                for i in range(2)
+            ]
+        else:
+            results = [
+                {
+                    "id": "callout_child",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": "Callout child"}]},
+                }
+            ]
+        return {"results": results, "next_cursor": None}
+
+    client.blocks.children.list.side_effect = mock_list
+    return client
+
+
+TABLE_AND_CALLOUT_BLOCKS = [
+    {"id": "table_id", "type": "table", "has_children": True, "table": {}},
+    {
+        "id": "callout_id",
+        "type": "callout",
+        "has_children": True,
+        "callout": {"rich_text": [{"plain_text": "Note"}], "icon": None},
+    },
+]
+
+
+def test_table_and_callout_children_fetched_once():
+    mock_client = table_and_callout_client(MagicMock())
+    n2m = NotionToMarkdown(notion_client=mock_client)
+
+    md_blocks = n2m.block_list_to_markdown(TABLE_AND_CALLOUT_BLOCKS)
+
+    assert "| Cell 0 |" in md_blocks[0]["parent"]
+    assert md_blocks[1]["parent"] == "> Note\n> Callout child"
+    assert mock_client.blocks.children.list.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_table_and_callout_children_fetched_once_async():
+    mock_client = table_and_callout_client(AsyncMock())
+    n2m = NotionToMarkdownAsync(notion_client=mock_client)
+
+    md_blocks = await n2m.block_list_to_markdown(TABLE_AND_CALLOUT_BLOCKS)
+
+    assert "| Cell 0 |" in md_blocks[0]["parent"]
+    assert md_blocks[1]["parent"] == "> Note\n> Callout child"
+    assert mock_client.blocks.children.list.call_count == 2
+
+
+def test_custom_transformer_children_are_fetched_on_demand():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [{"id": "row", "type": "paragraph", "has_children": False}],
+        "next_cursor": None,
+    }
+    n2m = NotionToMarkdown(notion_client=mock_client)
+    n2m.set_custom_transformer("child_database", lambda block: "Database")
+    n2m.set_custom_transformer(
+        "toggle", lambda block: f"{len(block['children'].get())} children"
+    )
+
+    md_blocks = n2m.block_list_to_markdown(
+        [
+            {"id": "db", "type": "child_database", "has_children": True, "child_database": {}},
+            {"id": "toggle", "type": "toggle", "has_children": True, "toggle": {}},
+        ]
+    )
+
+    assert [block["parent"] for block in md_blocks] == ["Database", "1 children"]
+    mock_client.blocks.children.list.assert_called_once_with(
+        start_cursor=None, block_id="toggle"
+    )
+
+
+@pytest.mark.asyncio
+async def test_custom_transformer_children_are_fetched_on_demand_async():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [{"id": "row", "type": "paragraph", "has_children": False}],
+        "next_cursor": None,
+    }
+
+    async def toggle_transformer(block):
+        children = await block["children"].get()
+        assert await block["children"].get() is children
+        return f"{len(children)} children"
+
+    n2m = NotionToMarkdownAsync(notion_client=mock_client)
+    n2m.set_custom_transformer("child_database", AsyncMock(return_value="Database"))
+    n2m.set_custom_transformer("toggle", toggle_transformer)
+
+    md_blocks = await n2m.block_list_to_markdown(
+        [
+            {"id": "db", "type": "child_database", "has_children": True, "child_database": {}},
+            {"id": "toggle", "type": "toggle", "has_children": True, "toggle": {}},
+        ]
+    )
+
+    assert [block["parent"] for block in md_blocks] == ["Database", "1 children"]
+    mock_client.blocks.children.list.assert_called_once_with(
+        start_cursor=None, block_id="toggle"
+    )
+
+
+def streamed_page_client(client):
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        if block_id == "page_id" and start_cursor is None:
+            results = [
+                {
+                    "id": "heading",
+                    "type": "heading_1",
+                    "has_children": False,
+                    "heading_1": {"rich_text": [{"plain_text": "Title"}]},
+                },
+                {
+                    "id": "bullet",
+                    "type": "bulleted_list_item",
+                    "has_children": True,
+                    "bulleted_list_item": {"rich_text": [{"plain_text": "Parent"}]},
+                },
+            ]
+            return {"results": results, "next_cursor": "cursor"}
+        if block_id == "page_id":
+            results = [
+                {
+                    "id": "toggle",
+                    "type": "toggle",
+                    "has_children": True,
+                    "toggle": {"rich_text": [{"plain_text": "Summary"}]},
+                },
+                {"id": "unsupported", "type": "unsupported", "has_children": False},
+            ]
+            return {"results": results, "next_cursor": None}
+        results = [
+            {
+                "id": f"{block_id}_child",
+                "type": "bulleted_list_item",
+                "has_children": False,
+                "bulleted_list_item": {"rich_text": [{"plain_text": f"{block_id} child"}]},
+            }
+        ]
+        return {"results": results, "next_cursor": None}
+
+    client.blocks.children.list.side_effect = mock_list
+    return client
+
+
+def test_page_to_markdown_stream_matches_to_markdown_string():
+    n2m = NotionToMarkdown(notion_client=streamed_page_client(MagicMock()))
+    expected = n2m.to_markdown_string(n2m.page_to_markdown("page_id"))["parent"]
+
+    sink = io.StringIO()
+    n2m.page_to_markdown_stream("page_id", sink)
+
+    assert sink.getvalue() == expected
+    assert len(list(n2m.iter_markdown("page_id"))) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+async def test_async_page_to_markdown_stream_matches_to_markdown_string(max_concurrency):
+    n2m = NotionToMarkdownAsync(
+        notion_client=streamed_page_client(AsyncMock()),
+        config={"max_concurrency": max_concurrency},
+    )
+    expected = n2m.to_markdown_string(await n2m.page_to_markdown("page_id"))["parent"]
+
+    sink = io.StringIO()
+    await n2m.page_to_markdown_stream("page_id", sink)
+
+    assert sink.getvalue() == expected
+
+
+@pytest.mark.asyncio
+async def test_database_to_markdown_converts_every_row():
+    mock_client = AsyncMock()
+    mock_client.databases.retrieve.return_value = {
+        "id": "database_id",
+        "data_sources": [{"id": "source"}],
+    }
+    mock_client.data_sources.query.return_value = {
+        "results": [{"object": "page", "id": f"row{i}"} for i in range(5)],
+        "next_cursor": None,
+    }
+
+    async def mock_list(block_id, start_cursor=None, **kwargs):
+        await asyncio.sleep(0.01)
+        return {
+            "results": [
+                {
+                    "id": f"{block_id}_para",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": f"{block_id} content"}]},
+                }
+            ],
+            "next_cursor": None,
+        }
+
+    mock_client.blocks.children.list.side_effect = mock_list
+    n2m = NotionToMarkdownAsync(notion_client=mock_client)
+
+    results = {
+        page["id"]: md_blocks
+        async for page, md_blocks in n2m.database_to_markdown("database_id", concurrency=2)
+    }
+
+    assert sorted(results) == [f"row{i}" for i in range(5)]
+    assert results["row3"][0]["parent"] == "row3 content"
+
+
+def image_block(block_id, url):
+    return {
+        "id": block_id,
+        "type": "image",
+        "has_children": False,
+        "image": {"type": "file", "file": {"url": url}, "caption": []},
+    }
+
+
+def image_transport(requested, content=None, headers=None):
+    """Serve the last 5 characters of the path, or content, recording requests"""
+
+    def handler(request):
+        requested.append(str(request.url))
+        body = content if content is not None else request.url.path[-5:].encode()
+        return httpx.Response(200, content=body, headers=headers)
+
+    return httpx.MockTransport(handler)
+
+
+def test_images_prefetched_on_executor_with_pooled_client():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [image_block("nested", "https://example.com/b.png")],
+        "next_cursor": None,
+    }
+    requested = []
+    http_client = httpx.Client(transport=image_transport(requested))
+
+    n2m = NotionToMarkdown(
+        notion_client=mock_client,
+        config={
+            "convert_images_to_base64": True,
+            "max_concurrency": 4,
+            "http_client": http_client,
+        },
+    )
+    md_blocks = n2m.block_list_to_markdown(
+        [
+            image_block("first", "https://example.com/a.png"),
+            {"id": "toggle", "type": "toggle", "has_children": True, "toggle": {}},
+            image_block("again", "https://example.com/a.png"),
+        ]
+    )
+
+    assert md_blocks[0]["parent"] == md.image_data("a.png", b"a.png")
+    assert md_blocks[1]["children"][0]["parent"] == md.image_data("b.png", b"b.png")
+    assert md_blocks[2]["parent"] == md_blocks[0]["parent"]
+    assert sorted(requested) == [
+        "https://example.com/a.png",
+        "https://example.com/b.png",
+    ]
+    n2m.close()
+    assert not http_client.is_closed
+
+
+def test_owned_http_client_is_closed():
+    with NotionToMarkdown(notion_client=MagicMock()) as n2m:
+        http_client = n2m.http_client
+        assert n2m.http_client is http_client
+
+    assert http_client.is_closed
+
+
+def test_owned_http_client_is_created_once_across_threads():
+    created = []
+
+    def slow_client():
+        time.sleep(0.01)
+        created.append(MagicMock())
+        return created[-1]
+
+    n2m = NotionToMarkdown(notion_client=MagicMock())
+    with patch.object(httpx, "Client", side_effect=slow_client):
+        threads = [
+            threading.Thread(target=lambda: n2m.http_client) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(created) == 1
+    assert n2m.http_client is created[0]
+
+
+@pytest.mark.asyncio
+async def test_async_images_downloaded_with_pooled_client():
+    requested = []
+    http_client = httpx.AsyncClient(
+        transport=image_transport(requested, content=b"image data")
+    )
+
+    async with NotionToMarkdownAsync(
+        notion_client=AsyncMock(),
+        config={"convert_images_to_base64": True, "http_client": http_client},
+    ) as n2m:
+        md_blocks = await n2m.block_list_to_markdown(
+            [image_block(f"image{i}", f"https://example.com/{i}.png") for i in range(3)]
+        )
+
+    assert [block["parent"] for block in md_blocks] == [
+        md.image_data(f"{i}.png", b"image data") for i in range(3)
+    ]
+    assert len(requested) == 3
+    assert not http_client.is_closed
+    await http_client.aclose()
+
+
+def test_image_cache_skips_downloads_of_cached_images(tmp_path):
+    requested = []
+    config = {
+        "convert_images_to_base64": True,
+        "http_client": httpx.Client(
+            transport=image_transport(requested, content=b"image data")
+        ),
+        "image_cache": ImageCache(str(tmp_path)),
+    }
+
+    for signature in ["1", "2"]:
+        n2m = NotionToMarkdown(notion_client=MagicMock(), config=config)
+        md_blocks = n2m.block_list_to_markdown(
+            [image_block("image", f"https://s3.example.com/image.png?X-Amz-Signature={signature}")]
+        )
+        assert md_blocks[0]["parent"].endswith("(data:image/png;base64,aW1hZ2UgZGF0YQ==)")
+
+    assert len(requested) == 1
+
+
+
+def test_image_cache_keeps_query_strings_of_external_images(tmp_path):
+    requested = []
+    n2m = NotionToMarkdown(
+        notion_client=MagicMock(),
+        config={
+            "convert_images_to_base64": True,
+            "http_client": httpx.Client(transport=image_transport(requested)),
+            "image_cache": ImageCache(str(tmp_path)),
+        },
+    )
+    blocks = [
+        {
+            "id": "image",
+            "type": "image",
+            "has_children": False,
+            "image": {"type": "external", "external": {"url": url}, "caption": []},
+        }
+        for url in ["https://example.com/a.png?v=1", "https://example.com/a.png?v=2"]
+    ]
+
+    for block in blocks:
+        n2m.block_list_to_markdown([block])
+
+    assert requested == ["https://example.com/a.png?v=1", "https://example.com/a.png?v=2"]
+
+@pytest.mark.asyncio
+async def test_async_image_cache_skips_downloads_of_cached_images(tmp_path):
+    requested = []
+    config = {
+        "convert_images_to_base64": True,
+        "http_client": httpx.AsyncClient(
+            transport=image_transport(requested, content=b"image data")
+        ),
+        "image_cache": ImageCache(str(tmp_path)),
+    }
+
+    for signature in ["1", "2"]:
+        n2m = NotionToMarkdownAsync(notion_client=AsyncMock(), config=config)
+        md_blocks = await n2m.block_list_to_markdown(
+            [image_block("image", f"https://s3.example.com/image.png?X-Amz-Signature={signature}")]
+        )
+        assert md_blocks[0]["parent"].endswith("(data:image/png;base64,aW1hZ2UgZGF0YQ==)")
+
+    assert len(requested) == 1
+
+
+def expiring_image_transport(requested):
+    """Deny the first signature of a URL like S3 does once it expired"""
+
+    def handler(request):
+        requested.append(str(request.url))
+        if request.url.params["X-Amz-Signature"] == "1":
+            return httpx.Response(403, content=b"<Error>AccessDenied</Error>")
+        return httpx.Response(200, content=b"image data")
+
+    return httpx.MockTransport(handler)
+
+
+def test_image_error_responses_are_linked_and_not_cached(tmp_path):
+    requested = []
+    config = {
+        "convert_images_to_base64": True,
+        "http_client": httpx.Client(transport=expiring_image_transport(requested)),
+        "image_cache": ImageCache(str(tmp_path)),
+    }
+
+    md_blocks = []
+    for signature in ["1", "2"]:
+        link = f"https://s3.example.com/image.png?X-Amz-Signature={signature}"
+        n2m = NotionToMarkdown(notion_client=MagicMock(), config=config)
+        md_blocks += n2m.block_list_to_markdown([image_block("image", link)])
+
+    assert md_blocks[0]["parent"] == md.image(
+        "image.png?X-Amz-Signature=1",
+        "https://s3.example.com/image.png?X-Amz-Signature=1",
+    )
+    assert md_blocks[1]["parent"].endswith("(data:image/png;base64,aW1hZ2UgZGF0YQ==)")
+    assert len(requested) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_image_error_responses_are_linked_and_not_cached(tmp_path):
+    requested = []
+    config = {
+        "convert_images_to_base64": True,
+        "http_client": httpx.AsyncClient(transport=expiring_image_transport(requested)),
+        "image_cache": ImageCache(str(tmp_path)),
+    }
+
+    md_blocks = []
+    for signature in ["1", "2"]:
+        link = f"https://s3.example.com/image.png?X-Amz-Signature={signature}"
+        n2m = NotionToMarkdownAsync(notion_client=AsyncMock(), config=config)
+        md_blocks += await n2m.block_list_to_markdown([image_block("image", link)])
+
+    assert "AccessDenied" not in md_blocks[0]["parent"]
+    assert md_blocks[1]["parent"].endswith("(data:image/png;base64,aW1hZ2UgZGF0YQ==)")
+    assert len(requested) == 2
+
+def test_images_over_max_inline_image_size_are_linked():
+    requested = []
+    n2m = NotionToMarkdown(
+        notion_client=MagicMock(),
+        config={
+            "convert_images_to_base64": True,
+            "max_inline_image_size": 4,
+            "http_client": httpx.Client(transport=image_transport(requested)),
+        },
+    )
+    md_blocks = n2m.block_list_to_markdown(
+        [image_block("image", "https://example.com/a.png")]
+    )
+
+    assert md_blocks[0]["parent"] == md.image("a.png", "https://example.com/a.png")
+
+
+def test_images_without_length_over_max_inline_image_size_are_linked():
+    def stream():
+        yield b"ab"
+        yield b"cdef"
+
+    http_client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=stream()))
+    )
+    n2m = NotionToMarkdown(
+        notion_client=MagicMock(),
+        config={
+            "convert_images_to_base64": True,
+            "max_inline_image_size": 4,
+            "http_client": http_client,
+        },
+    )
+    md_blocks = n2m.block_list_to_markdown(
+        [image_block("image", "https://example.com/a.png")]
+    )
+
+    assert md_blocks[0]["parent"] == md.image("a.png", "https://example.com/a.png")
+
+
+def test_iter_markdown_streams_image_data_in_chunks():
+    def stream():
+        for chunk in [b"ab", b"cdef", b"g"]:
+            yield chunk
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            {
+                "id": "heading",
+                "type": "heading_1",
+                "has_children": False,
+                "heading_1": {"rich_text": [{"plain_text": "Title"}]},
+            },
+            image_block("image", "https://example.com/a.png"),
+        ],
+        "next_cursor": None,
+    }
+    http_client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=stream()))
+    )
+    n2m = NotionToMarkdown(
+        notion_client=mock_client,
+        config={"convert_images_to_base64": True, "http_client": http_client},
+    )
+
+    chunks = list(n2m.iter_markdown("page_id"))
+
+    assert len(chunks) > 3
+    assert chunks[0].strip() == "# Title"
+    assert "".join(chunks[1:]).strip() == md.image_data("a.png", b"abcdefg")
+
+
+@pytest.mark.asyncio
+async def test_async_iter_markdown_streams_image_data_in_chunks():
+    async def stream():
+        for chunk in [b"ab", b"cdef", b"g"]:
+            yield chunk
+
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            image_block("image", "https://example.com/a.png"),
+            image_block("large", "https://example.com/b.png"),
+        ],
+        "next_cursor": None,
+    }
+
+    def handler(request):
+        if request.url.path.endswith("b.png"):
+            return httpx.Response(200, content=b"x" * 100)
+        return httpx.Response(200, content=stream())
+
+    n2m = NotionToMarkdownAsync(
+        notion_client=mock_client,
+        config={
+            "convert_images_to_base64": True,
+            "max_inline_image_size": 10,
+            "http_client": httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        },
+    )
+
+    chunks = [chunk async for chunk in n2m.iter_markdown("page_id")]
+
+    assert "".join(chunks).split() == [
+        md.image_data("a.png", b"abcdefg"),
+        md.image("b.png", "https://example.com/b.png"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_async_conversions_alongside_streaming_get_images():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [image_block("image", "https://example.com/a.png")],
+        "next_cursor": None,
+    }
+    n2m = NotionToMarkdownAsync(
+        notion_client=mock_client,
+        config={
+            "convert_images_to_base64": True,
+            "http_client": httpx.AsyncClient(transport=image_transport([])),
+        },
+    )
+    sink = io.StringIO()
+
+    _, md_blocks = await asyncio.gather(
+        n2m.page_to_markdown_stream("page_id", sink),
+        n2m.page_to_markdown("page_id"),
+    )
+
+    assert sink.getvalue().strip() == md.image_data("a.png", b"a.png")
+    assert md_blocks[0]["parent"] == md.image_data("a.png", b"a.png")
+
+
+def test_conversions_alongside_streaming_get_images():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [image_block("image", "https://example.com/a.png")],
+        "next_cursor": None,
+    }
+    n2m = NotionToMarkdown(
+        notion_client=mock_client,
+        config={
+            "convert_images_to_base64": True,
+            "max_concurrency": 2,
+            "http_client": httpx.Client(transport=image_transport([])),
+        },
+    )
+
+    chunks = n2m.iter_markdown("page_id")
+    first = next(chunks)
+    md_blocks = n2m.page_to_markdown("page_id")
+
+    assert (first + "".join(chunks)).strip() == md.image_data("a.png", b"a.png")
+    assert md_blocks[0]["parent"] == md.image_data("a.png", b"a.png")
+
+def file_block(block_id, block_type, url):
+    return {
+        "id": block_id,
+        "type": block_type,
+        "has_children": False,
+        block_type: {"type": "file", "file": {"url": url}, "caption": []},
+    }
+
+
+def test_media_files_downloaded_to_assets_dir(tmp_path):
+    requested = []
+    n2m = NotionToMarkdown(
+        notion_client=MagicMock(),
+        config={
+            "assets_dir": str(tmp_path / "assets"),
+            "max_concurrency": 4,
+            "http_client": httpx.Client(
+                transport=image_transport(requested, content=b"same data")
+            ),
+        },
+    )
+    md_blocks = n2m.block_list_to_markdown(
+        [
+            image_block("image", "https://example.com/a.png?X-Amz-Signature=1"),
+            file_block("pdf", "pdf", "https://example.com/doc.pdf"),
+            image_block("again", "https://example.com/a.png?X-Amz-Signature=1"),
+        ]
+    )
+
+    digest = hashlib.sha256(b"same data").hexdigest()
+    assets_dir = str(tmp_path / "assets")
+    assert md_blocks[0]["parent"].endswith(f"({assets_dir}/{digest}.png)")
+    assert md_blocks[1]["parent"] == f"[doc.pdf]({assets_dir}/{digest}.pdf)"
+    assert md_blocks[2]["parent"] == md_blocks[0]["parent"]
+    assert len(requested) == 2
+    assert sorted(path.name for path in (tmp_path / "assets").iterdir()) == [
+        f"{digest}.pdf",
+        f"{digest}.png",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_async_media_files_downloaded_to_assets_dir_once(tmp_path):
+    requested = []
+    n2m = NotionToMarkdownAsync(
+        notion_client=AsyncMock(),
+        config={
+            "assets_dir": str(tmp_path),
+            "max_concurrency": 4,
+            "http_client": httpx.AsyncClient(transport=image_transport(requested)),
+        },
+    )
+    md_blocks = await n2m.block_list_to_markdown(
+        [
+            file_block("video", "video", "https://example.com/clip.mp4"),
+            file_block("again", "video", "https://example.com/clip.mp4"),
+            image_block("image", "https://example.com/b.png"),
+        ]
+    )
+
+    video = hashlib.sha256(b"p.mp4").hexdigest()
+    image = hashlib.sha256(b"b.png").hexdigest()
+    assert md_blocks[0]["parent"] == f"[clip.mp4]({tmp_path}/{video}.mp4)"
+    assert md_blocks[1]["parent"] == md_blocks[0]["parent"]
+    assert md_blocks[2]["parent"] == md.image("b.png", f"{tmp_path}/{image}.png")
+    assert len(requested) == 2
+
+
+def test_media_files_with_error_responses_keep_their_url(tmp_path):
+    http_client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(404, content=b"<Error>NoSuchKey</Error>")
+        )
+    )
+    n2m = NotionToMarkdown(
+        notion_client=MagicMock(),
+        config={"assets_dir": str(tmp_path), "http_client": http_client},
+    )
+    md_blocks = n2m.block_list_to_markdown(
+        [
+            image_block("image", "https://example.com/a.png"),
+            file_block("pdf", "pdf", "https://example.com/doc.pdf"),
+        ]
+    )
+
+    assert md_blocks[0]["parent"] == md.image("a.png", "https://example.com/a.png")
+    assert md_blocks[1]["parent"] == "[doc.pdf](https://example.com/doc.pdf)"
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_async_media_files_with_error_responses_keep_their_url(tmp_path):
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(403, content=b"<Error>AccessDenied</Error>")
+        )
+    )
+    n2m = NotionToMarkdownAsync(
+        notion_client=AsyncMock(),
+        config={"assets_dir": str(tmp_path), "http_client": http_client},
+    )
+    md_blocks = await n2m.block_list_to_markdown(
+        [file_block("pdf", "pdf", "https://example.com/doc.pdf")]
+    )
+
+    assert md_blocks[0]["parent"] == "[doc.pdf](https://example.com/doc.pdf)"
+    assert list(tmp_path.iterdir()) == []
+
+def deeply_nested_client(client, depth):
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        level = int(block_id.split("-")[1]) + 1
+        block = {
+            "id": f"item-{level}",
+            "type": "bulleted_list_item",
+            "has_children": level < depth,
+            "bulleted_list_item": {"rich_text": [{"plain_text": str(level)}]},
+        }
+        return {"results": [block], "next_cursor": None}
+
+    client.blocks.children.list.side_effect = mock_list
+    return client
+
+
+def deeply_nested_markdown(depth):
+    return "".join("\t" * level + f"- {level}\n" for level in range(depth + 1))
+
+
+def test_deeply_nested_blocks_convert_past_recursion_limit():
+    depth = 2 * sys.getrecursionlimit()
+    n2m = NotionToMarkdown(notion_client=deeply_nested_client(MagicMock(), depth))
+    root = {
+        "id": "item-0",
+        "type": "bulleted_list_item",
+        "has_children": True,
+        "bulleted_list_item": {"rich_text": [{"plain_text": "0"}]},
+    }
+
+    md_blocks = n2m.block_list_to_markdown([root])
+
+    assert n2m.to_markdown_string(md_blocks)["parent"] == deeply_nested_markdown(depth)
+
+
+@pytest.mark.asyncio
+async def test_async_deeply_nested_blocks_convert_past_recursion_limit():
+    depth = 2 * sys.getrecursionlimit()
+    n2m = NotionToMarkdownAsync(notion_client=deeply_nested_client(AsyncMock(), depth))
+    root = {
+        "id": "item-0",
+        "type": "bulleted_list_item",
+        "has_children": True,
+        "bulleted_list_item": {"rich_text": [{"plain_text": "0"}]},
+    }
+
+    md_blocks = await n2m.block_list_to_markdown([root])
+
+    assert n2m.to_markdown_string(md_blocks)["parent"] == deeply_nested_markdown(depth)
+
+
+def repeated_synced_image_client(client):
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        if block_id == "page_id":
+            results = [
+                {
+                    "id": f"synced_copy{i}",
+                    "type": "synced_block",
+                    "has_children": True,
+                    "synced_block": {"synced_from": {"block_id": "original_id"}},
+                }
+                for i in range(2)
+            ]
+        else:
+            results = [image_block("image", "https://example.com/a.png")]
+        return {"results": results, "next_cursor": None}
+
+    client.blocks.children.list.side_effect = mock_list
+    return client
+
+
+def test_iter_markdown_streams_images_of_repeated_synced_blocks():
+    synced_block_cache = SyncedBlockCache()
+    config = {
+        "convert_images_to_base64": True,
+        "synced_block_cache": synced_block_cache,
+        "http_client": httpx.Client(transport=image_transport([])),
+    }
+    n2m = NotionToMarkdown(
+        notion_client=repeated_synced_image_client(MagicMock()), config=config
+    )
+
+    chunks = list(n2m.iter_markdown("page_id"))
+
+    image = md.image_data("a.png", b"a.png")
+    assert "".join(chunks).split() == [image, image]
+    other = NotionToMarkdown(
+        notion_client=repeated_synced_image_client(MagicMock()), config=config
+    )
+    md_blocks = other.page_to_markdown("page_id")
+    assert other.to_markdown_string(md_blocks)["parent"].split() == [image, image]
+
+
+@pytest.mark.asyncio
+async def test_async_iter_markdown_streams_images_of_repeated_synced_blocks():
+    n2m = NotionToMarkdownAsync(
+        notion_client=repeated_synced_image_client(AsyncMock()),
+        config={
+            "convert_images_to_base64": True,
+            "http_client": httpx.AsyncClient(transport=image_transport([])),
+        },
+    )
+
+    chunks = [chunk async for chunk in n2m.iter_markdown("page_id")]
+
+    image = md.image_data("a.png", b"a.png")
+    assert "".join(chunks).split() == [image, image]
+    assert "\x00" not in json.dumps(n2m.synced_block_cache._entries)
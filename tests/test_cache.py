@@ -0,0 +1,98 @@
+import os
+from notion_to_markdown.utils.cache import ImageCache, SQLiteBlockCache, SyncedBlockCache
+
+
+def test_sqlite_block_cache_round_trip(tmp_path):
+    path = str(tmp_path / "blocks.sqlite3")
+    blocks = [{"id": "1", "type": "paragraph", "paragraph": {"rich_text": []}}]
+
+    cache = SQLiteBlockCache(path)
+    cache.set("block_id", "2024-01-01T00:00:00.000Z", blocks)
+    cache.close()
+
+    cache = SQLiteBlockCache(path)
+    assert cache.get("block_id", "2024-01-01T00:00:00.000Z") == blocks
+    assert cache.get("block_id", "2024-01-02T00:00:00.000Z") is None
+    assert cache.get("other_id", "2024-01-01T00:00:00.000Z") is None
+
+
+def test_sqlite_block_cache_replaces_old_versions():
+    cache = SQLiteBlockCache(":memory:")
+    cache.set("block_id", "v1", [{"id": "old"}])
+    cache.set("block_id", "v2", [{"id": "new"}])
+
+    assert cache.get("block_id", "v1") is None
+    assert cache.get("block_id", "v2") == [{"id": "new"}]
+
+
+def test_sqlite_block_cache_evicts_least_recently_used():
+    cache = SQLiteBlockCache(":memory:", max_size=1)
+    cache.set("first", "v1", [{"id": "1"}])
+    cache.set("second", "v1", [{"id": "2"}])
+
+    assert cache.get("first", "v1") is None
+    assert cache.get("second", "v1") is None
+
+    cache.max_size = 10 * 2**10
+    cache.set("first", "v1", [{"id": "1"}])
+    cache.set("second", "v1", [{"id": "2"}])
+
+    assert cache.get("first", "v1") == [{"id": "1"}]
+    assert cache.get("second", "v1") == [{"id": "2"}]
+
+
+def test_synced_block_cache_evicts_least_recently_used():
+    cache = SyncedBlockCache(max_entries=2)
+    cache.set("first", [{"block_id": "1"}])
+    cache.set("second", [{"block_id": "2"}])
+    cache.get("first")
+    cache.set("third", [{"block_id": "3"}])
+
+    assert cache.get("first") == [{"block_id": "1"}]
+    assert cache.get("second") is None
+    assert cache.get("third") == [{"block_id": "3"}]
+
+
+def test_synced_block_cache_persists_to_store():
+    store = SQLiteBlockCache(":memory:")
+    SyncedBlockCache(store=store, version="2024-01-01").set("original", [{"block_id": "1"}])
+
+    assert SyncedBlockCache(store=store, version="2024-01-01").get("original") == [
+        {"block_id": "1"}
+    ]
+    assert SyncedBlockCache(store=store, version="2024-01-02").get("original") is None
+
+
+def test_image_cache_ignores_signed_query_strings(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    cache.set("https://s3.example.com/a/image.png?X-Amz-Signature=1", "block", b"data")
+
+    assert cache.get("https://s3.example.com/a/image.png?X-Amz-Signature=2", "block") == b"data"
+    assert cache.get("https://s3.example.com/a/image.png", "other_block") is None
+
+
+
+def test_image_cache_keys_external_images_by_whole_url(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    cache.set("https://example.com/chart.png?range=week", None, b"week")
+    cache.set("https://example.com/chart.png?range=month", None, b"month")
+
+    assert cache.get("https://example.com/chart.png?range=week", None) == b"week"
+    assert cache.get("https://example.com/chart.png?range=month", None) == b"month"
+
+def test_image_cache_stores_identical_contents_once(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    cache.set("https://example.com/a.png", "block1", b"data")
+    cache.set("https://example.com/b.png", "block2", b"data")
+
+    assert cache.get("https://example.com/b.png", "block2") == b"data"
+    assert len([name for name in os.listdir(tmp_path) if name != "index.sqlite3"]) == 1
+
+
+def test_image_cache_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(str(tmp_path), max_size=8)
+    cache.set("https://example.com/a.png", "block1", b"first")
+    cache.set("https://example.com/b.png", "block2", b"second")
+
+    assert cache.get("https://example.com/a.png", "block1") is None
+    assert cache.get("https://example.com/b.png", "block2") == b"second"
@@ -1,3 +1,7 @@
+import itertools
+import subprocess
+import sys
+import httpx
 import pytest
 from notion_to_markdown.main import MarkdownProvider
 from unittest.mock import MagicMock, patch, AsyncMock
@@ -24,7 +28,7 @@ def test_get_markdown_string():
         result = provider.get_markdown_string("test_page_id")
 
         assert result == "# Test content"
-        mock_n2m_class.assert_called_once_with(mock_notion)
+        mock_n2m_class.assert_called_once_with(mock_notion, provider.config)
         mock_n2m.page_to_markdown.assert_called_once_with("test_page_id")
         mock_n2m.to_markdown_string.assert_called_once_with(mock_blocks)
 
@@ -50,7 +54,7 @@ def test_get_markdown_string_async():
         result = provider.get_markdown_string_async("test_page_id")
 
         assert result == "# Test content"
-        mock_n2m_class.assert_called_once_with(mock_notion)
+        mock_n2m_class.assert_called_once_with(mock_notion, provider.config)
         mock_n2m.page_to_markdown.assert_called_once_with("test_page_id")
         mock_n2m.to_markdown_string.assert_called_once_with(mock_blocks)
 
@@ -60,3 +64,243 @@ def test_notion_client_none_raises_error():
     from notion_to_markdown import NotionToMarkdown
     with pytest.raises(ValueError, match="Notion client is not provided"):
         NotionToMarkdown(notion_client=None)
+
+
+def export_client():
+    mock_notion = MagicMock()
+
+    def mock_list(block_id, start_cursor=None, **kwargs):
+        return {
+            "results": [
+                {
+                    "id": f"{block_id}_para",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": f"{block_id} content"}]},
+                }
+            ],
+            "next_cursor": None,
+        }
+
+    mock_notion.blocks.children.list.side_effect = mock_list
+    return mock_notion
+
+
+def test_export_many():
+    provider = MarkdownProvider(export_client())
+
+    results = dict(provider.export_many(["page1", "page2", "page3"], concurrency=2))
+
+    assert results == {
+        "page1": "\npage1 content\n\n",
+        "page2": "\npage2 content\n\n",
+        "page3": "\npage3 content\n\n",
+    }
+
+
+
+def test_export_many_takes_page_ids_as_pages_complete():
+    taken = []
+
+    def page_ids():
+        for i in itertools.count():
+            taken.append(i)
+            yield f"page{i}"
+
+    provider = MarkdownProvider(export_client())
+    exports = provider.export_many(page_ids(), concurrency=2)
+
+    page_id, md_str = next(exports)
+    exports.close()
+
+    assert md_str == f"\n{page_id} content\n\n"
+    assert len(taken) <= 6
+
+@pytest.mark.asyncio
+async def test_export_many_async():
+    mock_notion = export_client()
+    mock_notion.blocks.children.list = AsyncMock(
+        side_effect=mock_notion.blocks.children.list.side_effect
+    )
+    provider = MarkdownProvider(mock_notion, config={"max_concurrency": 2})
+
+    results = {
+        page_id: md_str
+        async for page_id, md_str in provider.export_many_async(
+            ["page1", "page2"], concurrency=2
+        )
+    }
+
+    assert results == {
+        "page1": "\npage1 content\n\n",
+        "page2": "\npage2 content\n\n",
+    }
+
+
+
+@pytest.mark.asyncio
+async def test_export_many_async_takes_page_ids_as_pages_complete():
+    taken = []
+
+    def page_ids():
+        for i in itertools.count():
+            taken.append(i)
+            yield f"page{i}"
+
+    mock_notion = export_client()
+    mock_notion.blocks.children.list = AsyncMock(
+        side_effect=mock_notion.blocks.children.list.side_effect
+    )
+    provider = MarkdownProvider(mock_notion)
+    exports = provider.export_many_async(page_ids(), concurrency=2)
+
+    page_id, md_str = await exports.__anext__()
+    await exports.aclose()
+
+    assert md_str == f"\n{page_id} content\n\n"
+    assert len(taken) <= 3
+
+
+def image_export_client():
+    mock_notion = MagicMock()
+    mock_notion.blocks.children.list.side_effect = lambda block_id, **kwargs: {
+        "results": [
+            {
+                "id": f"{block_id}_image",
+                "type": "image",
+                "has_children": False,
+                "image": {
+                    "type": "external",
+                    "external": {"url": f"https://example.com/{block_id}.png"},
+                    "caption": [],
+                },
+            }
+        ],
+        "next_cursor": None,
+    }
+    return mock_notion
+
+
+def test_export_many_shares_one_http_client():
+    created = []
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"png"))
+
+    def client(real_client=httpx.Client):
+        created.append(real_client(transport=transport))
+        return created[-1]
+
+    provider = MarkdownProvider(
+        image_export_client(), config={"convert_images_to_base64": True}
+    )
+    with patch.object(httpx, "Client", side_effect=client):
+        results = dict(provider.export_many(["page1", "page2", "page3"], concurrency=2))
+
+    assert all("base64,cG5n" in md_str for md_str in results.values())
+    assert len(created) == 1
+    assert created[0].is_closed
+
+
+@pytest.mark.asyncio
+async def test_export_many_async_shares_one_http_client():
+    created = []
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"png"))
+
+    def client(real_client=httpx.AsyncClient):
+        created.append(real_client(transport=transport))
+        return created[-1]
+
+    mock_notion = image_export_client()
+    mock_notion.blocks.children.list = AsyncMock(
+        side_effect=mock_notion.blocks.children.list.side_effect
+    )
+    provider = MarkdownProvider(mock_notion, config={"convert_images_to_base64": True})
+    with patch.object(httpx, "AsyncClient", side_effect=client):
+        results = {
+            page_id: md_str
+            async for page_id, md_str in provider.export_many_async(
+                ["page1", "page2", "page3"], concurrency=2
+            )
+        }
+
+    assert all("base64,cG5n" in md_str for md_str in results.values())
+    assert len(created) == 1
+    assert created[0].is_closed
+
+
+def synced_export_client(footer):
+    """Pages holding a synced copy of an original with footer[0] as its text"""
+    mock_notion = MagicMock()
+    mock_notion.blocks.children.list.side_effect = lambda block_id, **kwargs: {
+        "results": [
+            {
+                "id": "synced_copy",
+                "type": "synced_block",
+                "has_children": True,
+                "synced_block": {"synced_from": {"block_id": "original_id"}},
+            }
+        ]
+        if block_id != "original_id"
+        else [
+            {
+                "id": "footer",
+                "type": "paragraph",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": footer[0]}]},
+            }
+        ],
+        "next_cursor": None,
+    }
+    return mock_notion
+
+
+def test_export_many_shares_synced_block_cache():
+    mock_notion = synced_export_client(["Footer"])
+    provider = MarkdownProvider(mock_notion)
+
+    results = dict(provider.export_many(["page1", "page2", "page3"], concurrency=1))
+
+    assert all("Footer" in md_str for md_str in results.values())
+    fetched = [call.kwargs["block_id"] for call in mock_notion.blocks.children.list.call_args_list]
+    assert fetched.count("original_id") == 1
+
+
+def test_get_markdown_string_renders_edited_synced_blocks():
+    footer = ["version 1"]
+    provider = MarkdownProvider(synced_export_client(footer))
+
+    assert "version 1" in provider.get_markdown_string("page1")
+    footer[0] = "version 2"
+    assert "version 2" in provider.get_markdown_string("page1")
+    assert "version 2" in dict(provider.export_many(["page1"]))["page1"]
+
+
+def test_export_database():
+    mock_notion = export_client()
+    mock_notion.databases.retrieve.return_value = {"id": "database_id"}
+    mock_notion.databases.query.return_value = {
+        "results": [{"object": "page", "id": "row1"}, {"object": "page", "id": "row2"}],
+        "next_cursor": None,
+    }
+    provider = MarkdownProvider(mock_notion)
+
+    results = dict(provider.export_database("database_id"))
+
+    assert results == {
+        "row1": "\nrow1 content\n\n",
+        "row2": "\nrow2 content\n\n",
+    }
+
+
+def test_import_defers_heavy_dependencies():
+    script = (
+        "import sys, notion_to_markdown; "
+        "print(sorted(name for name in "
+        "['asyncio', 'httpx', 'notion_client', 'pytablewriter', 'sqlite3'] "
+        "if name in sys.modules))"
+    )
+
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+
+    assert output.strip() == "[]"
@@ -202,3 +202,44 @@ async def test_image_error_handling(is_async):
 
         result = await image_func("alt", "data:image/png;base64,abc123") if is_async else image_func("alt", "data:image/png;base64,abc123")
         assert result == "![alt](data:image/png;base64,abc123)"
+
+
+def test_image_data():
+    assert md.image_data("alt", b"image data") == "![alt](data:image/png;base64,aW1hZ2UgZGF0YQ==)"
+
+
+def test_image_stream_matches_image_data():
+    chunks = [b"i", b"mage", b" da", b"ta"]
+
+    streamed = list(md.image_stream("alt", chunks))
+
+    assert len(streamed) > 2
+    assert "".join(streamed) == md.image_data("alt", b"image data")
+
+
+def test_prefix_lines():
+    assert md.prefix_lines("a\nb\n", "\t\t") == "\t\ta\n\t\tb\n\t\t"
+    assert md.prefix_lines("a\nb", "") == "a\nb"
+    assert md.quote("a\nb") == "> a\n> b"
+
+
+def test_markdown_table_escapes_and_pads_cells():
+    cells = [
+        ["a|b", "日本"],
+        ["line\nbreak"],
+        ["x", "y"],
+    ]
+    expected_output = """
+|    a\\|b    | 日本 |
+| ---------- | ---- |
+| line break |      |
+| x          | y    |
+""".strip()
+    assert md.table(cells) == expected_output
+    assert md.table([]) == ""
+
+
+def test_markdown_table_with_pytablewriter():
+    pytest.importorskip("pytablewriter")
+    cells = [["number", "char"], ["1", "a"]]
+    assert md.table(cells, use_pytablewriter=True) == md.table(cells)
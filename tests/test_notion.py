@@ -1,12 +1,31 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import pytest
-from unittest.mock import MagicMock, AsyncMock
+from unittest.mock import MagicMock, AsyncMock, patch
+from notion_client.errors import APIResponseError, APIErrorCode
+from notion_to_markdown import NotionToMarkdown, NotionToMarkdownAsync
+from notion_to_markdown.utils.cache import SQLiteBlockCache
 from notion_to_markdown.utils.notion import (
+    RateLimiter,
+    aiter_block_children,
+    aiter_database_pages,
+    iter_block_children,
+    iter_database_pages,
     get_block_children,
     get_block_children_async,
+    stale_file_blocks,
     modify_numbered_list_object,
 )
 
 
+def rate_limited_error(retry_after="2"):
+    response = httpx.Response(429, headers={"retry-after": retry_after})
+    return APIResponseError(response, "Rate limited", APIErrorCode.RateLimited)
+
+
 @pytest.mark.parametrize(
     "total_pages,expected_results,expected_calls",
     [
@@ -69,3 +88,373 @@ def test_modify_numbered_list_object():
     assert blocks[0]["numbered_list_item"]["number"] == 1
     assert blocks[1]["numbered_list_item"]["number"] == 2
     assert blocks[3]["numbered_list_item"]["number"] == 1
+
+
+def test_modify_numbered_list_object_continues_numbering():
+    blocks = [{"type": "numbered_list_item", "numbered_list_item": {}}]
+
+    assert modify_numbered_list_object(blocks, 2) == 3
+    assert blocks[0]["numbered_list_item"]["number"] == 3
+
+
+def test_rate_limiter_paces_after_burst():
+    rate_limiter = RateLimiter(rate=2.0, capacity=2)
+
+    delays = [rate_limiter._reserve() for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] == pytest.approx(0.5, abs=0.01)
+    assert delays[3] == pytest.approx(1.0, abs=0.01)
+
+
+def test_rate_limiter_without_rate_does_not_pace():
+    rate_limiter = RateLimiter(rate=None)
+
+    assert all(rate_limiter._reserve() == 0 for _ in range(100))
+
+
+def test_get_block_children_retries_after_rate_limit():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = [
+        rate_limited_error("2"),
+        {"results": [{"id": "1"}], "next_cursor": None},
+    ]
+    rate_limiter = RateLimiter(rate=None)
+
+    with patch("notion_to_markdown.utils.notion.time.sleep") as mock_sleep:
+        results = get_block_children(mock_client, "block_id", rate_limiter=rate_limiter)
+
+    assert results == [{"id": "1"}]
+    assert mock_client.blocks.children.list.call_count == 2
+    assert mock_sleep.call_args[0][0] == pytest.approx(2.0, abs=0.1)
+
+
+def test_get_block_children_gives_up_after_max_retries():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = rate_limited_error("0")
+    rate_limiter = RateLimiter(rate=None, max_retries=2)
+
+    with pytest.raises(APIResponseError):
+        get_block_children(mock_client, "block_id", rate_limiter=rate_limiter)
+
+    assert mock_client.blocks.children.list.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_block_children_async_retries_after_rate_limit():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.side_effect = [
+        rate_limited_error("0"),
+        {"results": [{"id": "1"}], "next_cursor": None},
+    ]
+
+    results = await get_block_children_async(
+        mock_client, "block_id", rate_limiter=RateLimiter(rate=None)
+    )
+
+    assert results == [{"id": "1"}]
+    assert mock_client.blocks.children.list.call_count == 2
+
+
+def test_get_block_children_uses_cache_for_versioned_blocks():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [{"id": "1", "type": "numbered_list_item", "numbered_list_item": {}}],
+        "next_cursor": None,
+    }
+    cache = SQLiteBlockCache(":memory:")
+
+    first = get_block_children(mock_client, "block_id", cache=cache, version="v1")
+    second = get_block_children(mock_client, "block_id", cache=cache, version="v1")
+    get_block_children(mock_client, "block_id", cache=cache)
+
+    assert first == second
+    assert second[0]["numbered_list_item"]["number"] == 1
+    assert mock_client.blocks.children.list.call_count == 2
+
+    get_block_children(mock_client, "block_id", cache=cache, version="v2")
+    assert mock_client.blocks.children.list.call_count == 3
+
+
+def file_block(block_id, expiry_time):
+    return {
+        "id": block_id,
+        "type": "image",
+        "image": {
+            "type": "file",
+            "file": {"url": f"https://s3.example.com/{block_id}.png", "expiry_time": expiry_time},
+            "caption": [],
+        },
+    }
+
+
+def expiring_children_client(client):
+    client.blocks.children.list.return_value = {
+        "results": [
+            file_block("stale", "2000-01-01T00:00:00.000Z"),
+            file_block("fresh", "2999-01-01T00:00:00.000Z"),
+            {"id": "paragraph", "type": "paragraph", "paragraph": {"rich_text": []}},
+        ],
+        "next_cursor": None,
+    }
+    client.blocks.retrieve.return_value = file_block("stale", "2999-01-01T00:00:00.000Z")
+    return client
+
+
+def test_stale_file_blocks():
+    callout = {
+        "id": "callout",
+        "type": "callout",
+        "callout": {"icon": {"type": "file", "file": {"url": "", "expiry_time": "2000-01-01T00:00:00Z"}}},
+    }
+    blocks = [
+        file_block("fresh", "2999-01-01T00:00:00.000Z"),
+        file_block("stale", "2000-01-01T00:00:00.000Z"),
+        callout,
+        {"id": "paragraph", "type": "paragraph", "paragraph": {}},
+    ]
+
+    assert stale_file_blocks(blocks) == [1, 2]
+
+
+def test_cached_children_refresh_only_expired_file_urls():
+    mock_client = expiring_children_client(MagicMock())
+    cache = SQLiteBlockCache(":memory:")
+
+    get_block_children(mock_client, "block_id", cache=cache, version="v1")
+    results = get_block_children(mock_client, "block_id", cache=cache, version="v1")
+    get_block_children(mock_client, "block_id", cache=cache, version="v1")
+
+    assert mock_client.blocks.children.list.call_count == 1
+    mock_client.blocks.retrieve.assert_called_once_with(block_id="stale")
+    assert stale_file_blocks(results) == []
+    assert [block["id"] for block in results] == ["stale", "fresh", "paragraph"]
+
+
+@pytest.mark.asyncio
+async def test_async_cached_children_refresh_only_expired_file_urls():
+    mock_client = expiring_children_client(AsyncMock())
+    cache = SQLiteBlockCache(":memory:")
+
+    await get_block_children_async(mock_client, "block_id", cache=cache, version="v1")
+    results = await get_block_children_async(
+        mock_client, "block_id", cache=cache, version="v1"
+    )
+
+    assert mock_client.blocks.children.list.call_count == 1
+    mock_client.blocks.retrieve.assert_called_once_with(block_id="stale")
+    assert stale_file_blocks(results) == []
+
+
+def test_converter_caches_children_by_last_edited_time():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.return_value = {
+        "results": [
+            {
+                "id": "child",
+                "type": "paragraph",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"plain_text": "Cached"}]},
+            }
+        ],
+        "next_cursor": None,
+    }
+    n2m = NotionToMarkdown(
+        notion_client=mock_client, config={"block_cache": SQLiteBlockCache(":memory:")}
+    )
+    blocks = [
+        {
+            "id": "toggle",
+            "type": "toggle",
+            "has_children": True,
+            "last_edited_time": "2024-01-01T00:00:00.000Z",
+            "toggle": {"rich_text": []},
+        }
+    ]
+
+    n2m.block_list_to_markdown(blocks)
+    md_blocks = n2m.block_list_to_markdown(blocks)
+
+    assert md_blocks[0]["children"][0]["parent"] == "Cached"
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+def numbered_pages():
+    return [
+        {
+            "results": [{"id": "1", "type": "numbered_list_item", "numbered_list_item": {}}],
+            "next_cursor": "cursor1",
+        },
+        {
+            "results": [{"id": "2", "type": "numbered_list_item", "numbered_list_item": {}}],
+            "next_cursor": None,
+        },
+    ]
+
+
+def test_iter_block_children_prefetches_next_page():
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = numbered_pages()
+
+    blocks = iter_block_children(mock_client, "block_id")
+    first = next(blocks)
+    for _ in range(100):
+        if mock_client.blocks.children.list.call_count == 2:
+            break
+        time.sleep(0.01)
+
+    assert mock_client.blocks.children.list.call_count == 2
+    assert [first, *blocks][1]["numbered_list_item"]["number"] == 2
+
+
+@pytest.mark.asyncio
+async def test_aiter_block_children_prefetches_next_page():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.side_effect = numbered_pages()
+
+    blocks = []
+    async for block in aiter_block_children(mock_client, "block_id"):
+        for _ in range(100):
+            if mock_client.blocks.children.list.call_count == 2:
+                break
+            await asyncio.sleep(0)
+        if not blocks:
+            assert mock_client.blocks.children.list.call_count == 2
+        blocks.append(block)
+
+    assert [block["numbered_list_item"]["number"] for block in blocks] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_async_page_to_markdown_converts_blocks_as_pages_arrive():
+    mock_client = AsyncMock()
+    mock_client.blocks.children.list.side_effect = numbered_pages()
+
+    n2m = NotionToMarkdownAsync(notion_client=mock_client, config={"max_concurrency": 2})
+    md_blocks = await n2m.page_to_markdown("page_id")
+
+    assert [block["block_id"] for block in md_blocks] == ["1", "2"]
+    assert [block["parent"] for block in md_blocks] == ["1. ", "2. "]
+
+
+def test_concurrent_requests_for_same_block_share_one_call():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_list(block_id, start_cursor=None):
+        started.set()
+        release.wait(1)
+        return {"results": [{"id": "1"}], "next_cursor": None}
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = slow_list
+
+    with ThreadPoolExecutor(2) as executor:
+        first = executor.submit(get_block_children, mock_client, "block_id")
+        started.wait(1)
+        second = executor.submit(get_block_children, mock_client, "block_id")
+        time.sleep(0.05)
+        release.set()
+
+        assert first.result() == second.result() == [{"id": "1"}]
+
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_requests_for_same_block_share_one_call():
+    async def slow_list(block_id, start_cursor=None):
+        await asyncio.sleep(0.01)
+        return {"results": [{"id": block_id}], "next_cursor": None}
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = slow_list
+
+    results = await asyncio.gather(
+        get_block_children_async(mock_client, "block_id"),
+        get_block_children_async(mock_client, "block_id"),
+        get_block_children_async(mock_client, "other_id"),
+    )
+
+    assert results == [[{"id": "block_id"}], [{"id": "block_id"}], [{"id": "other_id"}]]
+    assert mock_client.blocks.children.list.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_async_single_flight_shares_errors():
+    async def failing_list(block_id, start_cursor=None):
+        await asyncio.sleep(0.01)
+        raise rate_limited_error()
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = failing_list
+
+    rate_limiter = RateLimiter(rate=None, max_retries=0)
+
+    results = await asyncio.gather(
+        get_block_children_async(mock_client, "block_id", rate_limiter=rate_limiter),
+        get_block_children_async(mock_client, "block_id", rate_limiter=rate_limiter),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, APIResponseError) for result in results)
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_async_single_flight_survives_cancelled_leader():
+    async def slow_list(block_id, start_cursor=None):
+        await asyncio.sleep(0.01)
+        return {"results": [{"id": block_id}], "next_cursor": None}
+
+    mock_client = MagicMock()
+    mock_client.blocks.children.list.side_effect = slow_list
+
+    leader = asyncio.create_task(get_block_children_async(mock_client, "block_id"))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(get_block_children_async(mock_client, "block_id"))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == [{"id": "block_id"}]
+    assert leader.cancelled()
+    assert mock_client.blocks.children.list.call_count == 1
+
+
+def test_iter_database_pages_queries_every_data_source():
+    mock_client = MagicMock()
+    mock_client.databases.retrieve.return_value = {
+        "id": "database_id",
+        "data_sources": [{"id": "source1"}, {"id": "source2"}],
+    }
+    mock_client.data_sources.query.side_effect = [
+        {"results": [{"object": "page", "id": "row1"}], "next_cursor": "cursor"},
+        {"results": [{"object": "data_source", "id": "nested"}], "next_cursor": None},
+        {"results": [{"object": "page", "id": "row2"}], "next_cursor": None},
+    ]
+
+    rows = list(iter_database_pages(mock_client, "database_id"))
+
+    assert [row["id"] for row in rows] == ["row1", "row2"]
+    assert [call.kwargs for call in mock_client.data_sources.query.call_args_list] == [
+        {"data_source_id": "source1", "start_cursor": None},
+        {"data_source_id": "source1", "start_cursor": "cursor"},
+        {"data_source_id": "source2", "start_cursor": None},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_aiter_database_pages_queries_legacy_databases():
+    mock_client = AsyncMock()
+    mock_client.databases.retrieve.return_value = {"id": "database_id"}
+    mock_client.databases.query.return_value = {
+        "results": [{"object": "page", "id": "row1"}],
+        "next_cursor": None,
+    }
+
+    rows = [row async for row in aiter_database_pages(mock_client, "database_id")]
+
+    assert [row["id"] for row in rows] == ["row1"]
+    mock_client.databases.query.assert_called_once_with(
+        database_id="database_id", start_cursor=None
+    )